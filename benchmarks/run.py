@@ -0,0 +1,290 @@
+"""Microbenchmarks of the filesystem and parsing hot paths.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json --threshold 0.2
+
+Every stage runs on synthetic data of each size, is timed over several repeats and
+run once more under tracemalloc to record allocations. Results are written as JSON
+with sorted keys so files from different runs can be diffed and compared.
+"""
+
+import argparse
+from contextlib import contextmanager, redirect_stdout
+import gc
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from curseforge_cli.core.api import API
+from curseforge_cli.core.game import WoW
+from curseforge_cli.core.model import AddonInfo, CategorySection
+from curseforge_cli.core.output import OUTPUT_FORMAT, Writer
+
+from . import synthetic
+
+SCHEMA = 1
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+@contextmanager
+def _cwd(path: Path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+class Workspace:
+    def __init__(self, root: Path) -> None:
+        """Synthetic data shared between stages, created on first use"""
+        self.root = root
+        self.game = WoW(1, "wow_retail", "_retail_")
+        self.category_sections = [
+            CategorySection.from_api(synthetic.category_section())
+        ]
+        self._trees = {}
+        self._api = None
+
+    @property
+    def api(self) -> API:
+        """One API for all stages, its event loop thread lives until close"""
+        if self._api is None:
+            self._api = API()
+        return self._api
+
+    def close(self):
+        if self._api is not None:
+            self._api.close()
+
+    def tree(self, size: int) -> Path:
+        if size not in self._trees:
+            self._trees[size] = synthetic.make_addon_tree(
+                self.root / f"tree_{size}", size
+            )
+        return self._trees[size]
+
+
+def discover_addons(ws: Workspace, size: int) -> Callable:
+    game_path = ws.tree(size)
+    return lambda: ws.game._discover_addons(game_path, ws.category_sections)
+
+
+def get_addon_local_info(ws: Workspace, size: int) -> Callable:
+    addons_path = ws.tree(size) / "Interface" / "AddOns"
+    folders = sorted(addons_path.iterdir())
+    return lambda: [ws.game.get_addon_local_info(p) for p in folders]
+
+
+def addon_info_from_api(ws: Workspace, size: int) -> Callable:
+    payloads = [synthetic.addon_payload(i) for i in range(1, size + 1)]
+    return lambda: [AddonInfo.from_api(p) for p in payloads]
+
+
+def _list_addons(ws: Workspace, size: int, output_format: str) -> Callable:
+    """CurseCli.list, writing every resolved addon through a Writer"""
+    game_path = ws.tree(size)
+    addons = ws.game._discover_addons(game_path, ws.category_sections)
+    for addon in addons:
+        addon.info = AddonInfo.from_api(
+            synthetic.addon_payload(addon.local_info.curse_id)
+        )
+    addons.sort(key=lambda a: a.local_info.folder_name)
+
+    def _run():
+        stream = io.StringIO()
+        writer = Writer(output_format, stream)
+        for addon in addons:
+            writer.write(addon, game=ws.game.slug)
+        writer.close()
+        return stream
+
+    return _run
+
+
+def list_table(ws: Workspace, size: int) -> Callable:
+    return _list_addons(ws, size, OUTPUT_FORMAT.TABLE)
+
+
+def list_ndjson(ws: Workspace, size: int) -> Callable:
+    return _list_addons(ws, size, OUTPUT_FORMAT.NDJSON)
+
+
+def download_addon_extract(ws: Workspace, size: int) -> Callable:
+    """download_addon with the API response and the archive already cached,
+    so only extraction is measured. size is the number of archive members
+    """
+    root = ws.root / f"extract_{size}"
+    game_path = root / "game"
+    (game_path / "Interface" / "AddOns").mkdir(parents=True)
+
+    payload = synthetic.addon_payload(1)
+    addon_file = AddonInfo.from_api(payload).latest_file
+    synthetic.make_archive(
+        root / "appdata" / "archives" / f"{addon_file.id}.zip", size, 4 * 1024
+    )
+
+    api = ws.api
+    api.core._json_cache[f"{api.base_url}/addon/1"] = (time.monotonic(), payload)
+
+    def _run():
+        with _cwd(root), open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            return api.download_addon(1, game_path, ws.game, addon_file)
+
+    return _run
+
+
+STAGES: Dict[str, Callable[[Workspace, int], Callable]] = {
+    "discover_addons": discover_addons,
+    "get_addon_local_info": get_addon_local_info,
+    "addon_info_from_api": addon_info_from_api,
+    "list_table": list_table,
+    "list_ndjson": list_ndjson,
+    "download_addon_extract": download_addon_extract,
+}
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    """Time fn repeat times with gc paused, then trace allocations of one more run"""
+    fn()  # warm up file system caches and lazy imports
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = fn()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    diff = after.compare_to(before, "filename")
+    del result
+
+    return {
+        "repeat": repeat,
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "peak_bytes": peak,
+        "retained_bytes": sum(d.size_diff for d in diff),
+        "retained_blocks": sum(d.count_diff for d in diff),
+    }
+
+
+def run(stages: List[str], sizes: List[int], repeat: int) -> dict:
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="curseforge-bench-") as tmp_dir:
+        ws = Workspace(Path(tmp_dir))
+
+        try:
+            for stage in stages:
+                for size in sizes:
+                    fn = STAGES[stage](ws, size)
+                    result = {"stage": stage, "size": size, **measure(fn, repeat)}
+                    results.append(result)
+                    print(
+                        f"{stage:<24} {size:>6} {result['median_s'] * 1000:>10.2f} ms "
+                        f"{result['peak_bytes'] / 1024:>10.0f} KiB peak"
+                    )
+        finally:
+            ws.close()
+
+    return {
+        "schema": SCHEMA,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+        },
+        "results": sorted(results, key=lambda r: (r["stage"], r["size"])),
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Stages slower or using more memory than baseline by more than threshold"""
+    old = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+
+    for r in report["results"]:
+        b = old.get((r["stage"], r["size"]))
+        if not b:
+            continue
+
+        for metric in ("median_s", "peak_bytes"):
+            if b[metric] and r[metric] / b[metric] > 1 + threshold:
+                regressions.append(
+                    f"{r['stage']} [{r['size']}] {metric}: "
+                    f"{b[metric]} -> {r[metric]} (x{r[metric] / b[metric]:.2f})"
+                )
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument(
+        "--stages", default=",".join(STAGES), help="Comma separated stage names"
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma separated"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression before failing. Defaults to 0.2",
+    )
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(",")
+    unknown = set(stages) - STAGES.keys()
+    if unknown:
+        parser.error(f"unknown stages {', '.join(sorted(unknown))}")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    report = run(stages, sizes, args.repeat)
+
+    if args.output:
+        with args.output.open("w") as out_f:
+            json.dump(report, out_f, indent=2, sort_keys=True)
+            out_f.write("\n")
+
+    if args.baseline:
+        with args.baseline.open("r") as baseline_f:
+            regressions = compare(report, json.load(baseline_f), args.threshold)
+
+        for r in regressions:
+            print(f"[REGRESSION] {r}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
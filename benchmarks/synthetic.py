@@ -0,0 +1,124 @@
+"""Synthetic addon trees and API payloads shaped like real WoW data"""
+
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZipFile
+
+FLAVORS = ["wow_retail", "wow_classic", "wow_burning_crusade"]
+
+TOC_TEMPLATE = """## Interface: 90005
+## Title: |cff00ff00{name}|r
+## Notes: Synthetic addon number {i} used for benchmarks
+## Author: Benchmark
+## Version: 1.{i}.0
+## X-Curse-Project-ID: {i}
+## X-Website: https://www.curseforge.com/wow/addons/{slug}
+## SavedVariables: {name}DB
+## OptionalDeps: Ace3, LibSharedMedia-3.0
+## X-Embeds: Ace3
+
+libs\\LibStub\\LibStub.lua
+libs\\AceAddon-3.0\\AceAddon-3.0.xml
+locales\\enUS.lua
+{name}.lua
+Options.lua
+"""
+
+
+def category_section(path: str = "Interface/AddOns") -> dict:
+    return {
+        "name": "Addons",
+        "packageType": 1,
+        "path": path,
+        "initialInclusionPattern": ".",
+        "extraIncludePattern": None,
+    }
+
+
+def make_addon_tree(root: Path, count: int, files_per_addon: int = 4) -> Path:
+    """Create count addon folders with a .toc and some lua files. Returns the game path"""
+    addons_path = root / "Interface" / "AddOns"
+
+    for i in range(1, count + 1):
+        name = f"Addon{i}"
+        addon_path = addons_path / name
+        addon_path.mkdir(parents=True)
+
+        toc = TOC_TEMPLATE.format(name=name, i=i, slug=f"addon-{i}")
+        (addon_path / f"{name}.toc").write_text(toc, encoding="utf-8")
+
+        for j in range(files_per_addon):
+            (addon_path / f"File{j}.lua").write_text(f"local x = {j}\n" * 20)
+
+    return root
+
+
+def file_payload(addon_id: int, file_id: int, flavor: str) -> dict:
+    return {
+        "id": file_id,
+        "displayName": f"Addon{addon_id} v1.{file_id}",
+        "fileName": f"Addon{addon_id}-1.{file_id}.zip",
+        "fileDate": f"2021-0{1 + file_id % 9}-15T12:34:56.{file_id % 1000:03}Z",
+        "downloadUrl": f"https://edge.forgecdn.net/files/{file_id}/Addon{addon_id}.zip",
+        "dependencies": [
+            {"addonId": addon_id + k, "type": 3} for k in range(1, 1 + file_id % 3)
+        ],
+        "modules": [
+            {
+                "foldername": f"Addon{addon_id}",
+                "fingerprint": addon_id * 2654435761 % 2**32,
+            },
+            {"foldername": f"Addon{addon_id}_Options", "fingerprint": 1},
+        ],
+        "projectId": addon_id,
+        "gameId": 1,
+        "gameVersion": ["9.0.5"] if flavor == "wow_retail" else ["1.13.7"],
+        "gameVersionFlavor": flavor,
+    }
+
+
+def addon_payload(addon_id: int) -> dict:
+    return {
+        "id": addon_id,
+        "name": f"Addon {addon_id}",
+        "authors": [{"name": "Benchmark"}, {"name": "Contributor"}],
+        "websiteUrl": f"https://www.curseforge.com/wow/addons/addon-{addon_id}",
+        "summary": "A synthetic addon with a summary of realistic length. " * 3,
+        "downloadCount": 1234567.0 * addon_id,
+        "latestFiles": [
+            file_payload(addon_id, addon_id * 10 + k, flavor)
+            for k, flavor in enumerate(FLAVORS)
+        ],
+        "categorySection": category_section(),
+        "slug": f"addon-{addon_id}",
+    }
+
+
+def game_payload(game_path: Path) -> dict:
+    return {
+        "id": 1,
+        "name": "World of Warcraft",
+        "slug": "wow",
+        "gameFiles": [],
+        "gameDetectionHints": [
+            {
+                "hintType": 2,
+                "hintPath": str(game_path),
+                "hintKey": None,
+                "hintOptions": 0,
+            }
+        ],
+        "categorySections": [category_section()],
+    }
+
+
+def make_archive(path: Path, members: int, member_size: int = 16 * 1024) -> Path:
+    """Create an addon archive with members files spread over a few folders"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunk = b"local function f() return 42 end\n"
+    data = (chunk * (member_size // len(chunk) + 1))[:member_size]
+
+    with ZipFile(path, "w", ZIP_DEFLATED) as zip_f:
+        for i in range(members):
+            zip_f.writestr(f"BenchAddon/Module{i % 10}/File{i}.lua", data)
+
+    return path
@@ -1,20 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 import os
+from pathlib import Path
 import sys
-from typing import List
+from typing import Callable, Dict, List, Optional, Set
+from zipfile import BadZipFile
 
-from .core.api import API
+from .core.api import API, archive_path
 from .core.game import GAMES, NoFoldersFound, MultipleFoldersFound
-from .core.model import InstalledAddon, InstalledGame
+from .core.model import (
+    SYNC_ACTION,
+    AddonFile,
+    AddonInfo,
+    InstalledAddon,
+    InstalledGame,
+    SyncStep,
+    colors,
+)
+from .core.output import OUTPUT_FORMAT, Writer
+from .core.pack import install_pack
+from .core.sync import (
+    apply_sync_step,
+    load_lockfile,
+    load_manifest,
+    lockfile_path,
+    plan_sync,
+    save_lockfile,
+)
+from .core.verify import HashCache, repair, verify_game
+from .core.watch import AddonWatcher
 
 
 class CliError(Exception):
     """Raise when client should exit due to some error"""
 
 
+def parse_game_slugs(game_slugs: str) -> List[str]:
+    """Parse `all` or a comma separated list of game slugs"""
+    if game_slugs == "all":
+        return list(GAMES.keys())
+
+    return [slug.strip() for slug in game_slugs.split(",") if slug.strip()]
+
+
 class CurseCli:
-    def __init__(self, game_slug: str) -> None:
+    def __init__(
+        self, game_slug: str, api: Optional[API] = None, writer: Optional[Writer] = None
+    ) -> None:
 
-        os.system("color")  # enable colors in windows terminal
+        if os.name == "nt":
+            os.system("color")  # enable colors in windows terminal
 
         try:
             self.game = GAMES[game_slug]
@@ -23,7 +59,9 @@ class CurseCli:
                 f"{game_slug} is not supported. Choose from {', '.join(GAMES.keys())}"
             )
 
-        self.api = API()
+        self.game_slug = game_slug
+        self.api = api or API()
+        self.writer = writer or Writer()
 
         self._installed_game = None
 
@@ -57,33 +95,222 @@ class CurseCli:
             info = self.api.get_game_info(self.game.curse_id)
             return self.game.discover(info)
 
-    def _resolve_installed_addons(self, addons: List[InstalledAddon]) -> InstalledGame:
+    def _resolve_installed_addons(
+        self, addons: List[InstalledAddon], max_age: Optional[float] = None
+    ) -> List[InstalledAddon]:
+        """Attach addon infos, cached API responses older than max_age are fetched again"""
+        installed_files = self.game.load_installed_files()
+
+        ids = [a.local_info.curse_id for a in addons if a.local_info.curse_id]
+        addon_infos = self.api.get_addons(ids, self.game.slug, max_age)
+
         for addon in addons:
-            try:
-                addon_info = self.api.get_addon(
-                    addon.local_info.curse_id, self.game.slug
-                )
-                addon.info = addon_info
-            except Exception:
-                pass
+            addon.info = addon_infos.get(addon.local_info.curse_id)
+            addon.file_id = installed_files.get(addon.local_info.curse_id)
 
         return addons
 
     def list(self):
-        print(self.installed_game.view)
+        installed_game = self.installed_game
+
+        if not installed_game.addons:
+            self.writer.text(f"\nNo addons installed for {installed_game.info.name}")
+
+        for addon in installed_game.addons:
+            self.writer.write(addon, game=self.game_slug)
 
     def search(self, query: str, **kwargs):
         results = self.api.search_addon(
             query, self.game.curse_id, self.game.slug, **kwargs
         )
+        self.write_search_results(results)
+
+    def write_search_results(self, results: List[AddonInfo]):
         for r in results:
-            print("")
-            print(r.view)
+            self.writer.text("")
+            self.writer.write(r, game=self.game_slug)
 
     def install(self, query: int, **kwargs):
         extract_path = self.installed_game.path
 
-        self.api.download_addon(int(query), extract_path, self.game.slug)
+        curse_id = int(query)
+        addon_file = self.api.download_addon(curse_id, extract_path, self.game)
+
+        if addon_file:
+            self._record_installed_files({curse_id: addon_file})
+
+    def add_path(self, path: str):
+        """Use path as the game folder instead of discovering it"""
+        game_path = Path(path).expanduser()
+        if not game_path.is_dir():
+            raise CliError(f"{path} is not a folder")
+
+        self.game.save_path(game_path.resolve())
+        self._installed_game = None
+
+        self.writer.text(f"Using {game_path.resolve()} for {self.game_slug}")
+
+    def install_pack(self, source: str):
+        """Install a modpack from its archive or by its curseforge id"""
+        instance_path = self.installed_game.path
+        pack_file_id = None  # of a pack downloaded into the archive cache
+
+        if Path(source).is_file():
+            archive_path = Path(source)
+        else:
+            try:
+                curse_id = int(source)
+            except ValueError:
+                raise CliError(f"{source} is neither a modpack archive nor an addon id")
+
+            addon = self.api.get_addon(curse_id, self.game.slug)
+            if not addon:
+                raise CliError(
+                    f"Addon #{curse_id} is not available for {self.game_slug}"
+                )
+
+            print(f"Downloading {addon.name} {addon.latest_file.display_name}")
+            archive_path = self.api.download_archive(addon.latest_file)
+            if not archive_path:
+                raise CliError(f"Failed to download {addon.name}")
+            pack_file_id = addon.latest_file.id
+
+        try:
+            manifest, installed, failed = self.api.run(
+                install_pack(archive_path, instance_path, self.api.core, self.game)
+            )
+        except (BadZipFile, ValueError) as e:
+            raise CliError(str(e))
+
+        if installed:
+            self._record_installed_files(installed)
+
+        # the pack itself is never installed, so its archive would never be pruned
+        if pack_file_id is not None:
+            self._prune_archives({pack_file_id})
+
+        self.writer.text(
+            f"Installed {manifest.name} {manifest.version or ''} to {instance_path}: {len(installed)} files, {len(failed)} failed"
+        )
+
+    def _record_installed_files(self, changes: Dict[int, Optional[AddonFile]]):
+        """Remember installed files of addons, None for removed addons.
+        Cached archives of files that are no longer installed are removed.
+        """
+        installed_files = self.game.load_installed_files()
+        file_names = self.game.load_installed_file_names()
+        replaced = set()
+
+        for curse_id, addon_file in changes.items():
+            file_id = addon_file.id if addon_file else None
+            old_file_id = installed_files.get(curse_id)
+            if old_file_id is not None and old_file_id != file_id:
+                replaced.add(old_file_id)
+
+            if addon_file is None:
+                installed_files.pop(curse_id, None)
+                file_names.pop(curse_id, None)
+            else:
+                installed_files[curse_id] = addon_file.id
+                # single file addons are matched to their project by file name
+                file_names[curse_id] = addon_file.file_name
+
+        self.game.save_installed_files(installed_files)
+        self.game.save_installed_file_names(file_names)
+
+        for installed_addon in self.installed_game.addons:
+            if installed_addon.local_info.curse_id in changes:
+                installed_addon.file_id = installed_files.get(
+                    installed_addon.local_info.curse_id
+                )
+
+        self._prune_archives(replaced)
+
+    @staticmethod
+    def _prune_archives(file_ids: Set[int]):
+        """Remove cached archives of file_ids, unless some game still has them installed"""
+        in_use = {
+            file_id
+            for game in GAMES.values()
+            for file_id in game.load_installed_files().values()
+        }
+
+        for file_id in file_ids - in_use:
+            path = archive_path(file_id)
+            if path.exists():
+                path.unlink()
+
+    def update(self, **kwargs):
+        outdated = {}
+
+        # a single archive may contain several folders of the same addon
+        for addon in self.installed_game.addons:
+            if addon.is_outdated:
+                outdated[addon.info.curse_id] = addon
+
+        if not outdated:
+            print(f"All {self.game_slug} addons are up to date")
+            return
+
+        installed = self.api.download_addons(
+            outdated, self.installed_game.path, self.game
+        )
+
+        changes = {curse_id: f for curse_id, f in installed.items() if f}
+        if changes:
+            self._record_installed_files(changes)
+
+    def sync(self, manifest_path: str = "curseforge.json", dry_run: bool = False):
+        MultiCurseCli([self], writer=self.writer).sync(manifest_path, dry_run)
+
+    def verify(self, repair_files: bool = False):
+        """Report addons whose files differ from their archives, optionally repair them"""
+        hash_cache = HashCache(Path(f"./appdata/hash_cache/{self.game.slug}.json"))
+
+        verified, skipped, unverifiable = verify_game(
+            self.game_slug,
+            self.installed_game,
+            self.game.load_installed_files(),
+            self.api,
+            self.game,
+            hash_cache,
+        )
+        hash_cache.save()
+
+        broken = [v for v in verified if not v[0].is_intact]
+
+        for result, _, _ in broken:
+            self.writer.write(result)
+
+        if not broken:
+            self.writer.text(
+                f"All {len(verified)} verified {self.game_slug} addons are intact"
+            )
+        if skipped:
+            self.writer.text(
+                f"Skipped {skipped} addons with unknown installed files. Reinstall them to verify"
+            )
+        if unverifiable:
+            self.writer.text(
+                f"Skipped {unverifiable} unverifiable addons without a cached archive. Reinstall them to verify"
+            )
+        self.writer.flush()
+
+        if repair_files:
+            for result, archive_path, extract_path in broken:
+                if result.modified or result.missing:
+                    repair(
+                        result, archive_path, extract_path, self.game.single_file_addons
+                    )
+
+    def watch(self) -> AddonWatcher:
+        """Keep installed game addons up to date with addon folders"""
+        watcher = AddonWatcher(
+            self.game, self.installed_game, resolve=self._resolve_installed_addons
+        )
+        watcher.start()
+
+        return watcher
 
     def config(self, action: str, path: str):
         if action == "export":
@@ -92,21 +319,225 @@ class CurseCli:
             print(f"Placeholder for {action} {path}")
 
 
-def parse_args():
-    argv = sys.argv[1:]
+class MultiCurseCli:
+    """Run list, search and update for several games at once.
+
+    Games should share a single API instance, so game info, addon info and search results
+    are fetched once for all flavors of the same game.
+    """
+
+    def __init__(self, clis: List[CurseCli], writer: Optional[Writer] = None) -> None:
+        self.writer = writer or Writer()
+        self.clis = clis
+
+    def _header(self, cli: CurseCli) -> str:
+        return f"\n{colors.BLACK}{colors.BG_YELLOW} {cli.game_slug} {colors.RESET}"
+
+    def _load(self, cli: CurseCli) -> Optional[str]:
+        try:
+            cli.installed_game
+        except CliError as ce:
+            return str(ce)
+        except Exception as e:
+            # e.g. the API failed for this game only, the other games still load
+            return f"Failed to load {cli.game_slug} because {type(e)}: {e}"
+
+    def _load_all(self, clis: Optional[List[CurseCli]] = None) -> List[CurseCli]:
+        clis = self.clis if clis is None else clis
+        if not clis:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(clis)) as executor:
+            errors = list(executor.map(self._load, clis))
+
+        installed = []
+        for cli, error in zip(clis, errors):
+            if error:
+                print(f"[ERROR] {error}. Skipping...")
+            else:
+                installed.append(cli)
+
+        return installed
+
+    def list(self):
+        for cli in self._load_all():
+            self.writer.text(self._header(cli))
+            cli.list()
+
+    def search(self, query: str, **kwargs):
+        def _search(cli: CurseCli):
+            try:
+                return cli.api.search_addon(
+                    query, cli.game.curse_id, cli.game.slug, **kwargs
+                )
+            except Exception as e:
+                print(
+                    f"[ERROR] Failed to search {cli.game_slug} because {type(e)}: {e}. Skipping..."
+                )
+
+        with ThreadPoolExecutor(max_workers=len(self.clis)) as executor:
+            results = list(executor.map(_search, self.clis))
+
+        for cli, game_results in zip(self.clis, results):
+            if game_results is None:
+                continue
+
+            self.writer.text(self._header(cli))
+            cli.write_search_results(game_results)
+
+    def update(self, **kwargs):
+        for cli in self._load_all():
+            self.writer.text(self._header(cli))
+            self.writer.flush()
+            cli.update(**kwargs)
+
+    def verify(self, **kwargs):
+        for cli in self._load_all():
+            self.writer.text(self._header(cli))
+            cli.verify(**kwargs)
+
+    def sync(self, manifest_path: str = "curseforge.json", dry_run: bool = False):
+        """Install, upgrade and remove addons to match the manifest and its lockfile.
+        Writes installed file ids back to the lockfile.
+        """
+        manifest_path = Path(manifest_path)
+        lock_path = lockfile_path(manifest_path)
+
+        try:
+            manifest = load_manifest(manifest_path)
+        except FileNotFoundError:
+            raise CliError(f"Manifest {manifest_path} does not exist")
+        lockfile = load_lockfile(lock_path)
+
+        clis = self._load_all(
+            [cli for cli in self.clis if cli.game_slug in manifest.games]
+        )
+        if not clis:
+            raise CliError(f"None of the games in {manifest_path} are installed")
+
+        def _plan(cli: CurseCli):
+            return plan_sync(
+                cli.game_slug,
+                cli.installed_game,
+                manifest.games[cli.game_slug].addons,
+                lockfile.games.get(cli.game_slug, {}),
+                cli.api,
+                cli.game.slug,
+            )
+
+        with ThreadPoolExecutor(max_workers=len(clis)) as executor:
+            plans = list(executor.map(_plan, clis))
+
+        for cli, steps in zip(clis, plans):
+            self.writer.text(self._header(cli))
+            for step in steps:
+                self.writer.write(step)
+        self.writer.flush()
+
+        if dry_run:
+            return
+
+        work = [
+            (cli, step)
+            for cli, steps in zip(clis, plans)
+            for step in steps
+            if step.action != SYNC_ACTION.NOOP
+        ]
+
+        async def _apply(cli: CurseCli, step: SyncStep) -> bool:
+            try:
+                addon_file = await apply_sync_step(
+                    step, cli.installed_game, cli.api.core, cli.game
+                )
+                return step.action == SYNC_ACTION.REMOVE or addon_file is not None
+            except Exception as e:
+                print(f"Failed to {step.action} {step.name} because {type(e)}: {e}")
+                return False
+
+        async def _apply_all() -> List[bool]:
+            return await asyncio.gather(*(_apply(cli, step) for cli, step in work))
+
+        # games share one API, all steps are downloaded concurrently in its event loop
+        results = clis[0].api.run(_apply_all())
+        succeeded = {id(step) for (_, step), ok in zip(work, results) if ok}
+
+        for cli, steps in zip(clis, plans):
+            old_pins = lockfile.games.get(cli.game_slug, {})
+            pins = {}
+            changes = {}
+
+            for step in steps:
+                if step.action == SYNC_ACTION.NOOP:
+                    # a file installed by another tool is unknown, don't pin a guess
+                    if step.installed_file_id == step.file.id:
+                        pins[step.curse_id] = step.file.id
+                elif id(step) not in succeeded:
+                    if step.curse_id in old_pins:
+                        pins[step.curse_id] = old_pins[step.curse_id]
+                elif step.action == SYNC_ACTION.REMOVE:
+                    changes[step.curse_id] = None
+                else:
+                    pins[step.curse_id] = step.file.id
+                    changes[step.curse_id] = step.file
+
+            # addons skipped while planning keep their pins
+            planned = {step.curse_id for step in steps}
+            for curse_id in manifest.games[cli.game_slug].addons:
+                if curse_id not in planned and curse_id in old_pins:
+                    pins[curse_id] = old_pins[curse_id]
+
+            if changes:
+                cli._record_installed_files(changes)
+            lockfile.games[cli.game_slug] = pins
+
+        save_lockfile(lockfile, lock_path)
+
+
+def _pop_option(argv: List[str], name: str, default: str) -> str:
+    try:
+        i = argv.index(name)
+    except ValueError:
+        return default
+
+    try:
+        value = argv[i + 1]
+    except IndexError:
+        raise CliError(f"{name} requires a value")
+
+    del argv[i : i + 2]
+
+    return value
+
+
+def parse_args(argv: List[str]):
+    argv = list(argv)
+
+    output_format = _pop_option(argv, "--format", OUTPUT_FORMAT.TABLE)
+    if output_format not in OUTPUT_FORMAT.ALL:
+        raise CliError(
+            f"Format '{output_format}' is not supported. Choose from {', '.join(OUTPUT_FORMAT.ALL)}"
+        )
 
     game_slug = argv.pop(0)
     action = argv.pop(0)
     args = []
     kwargs = {}
 
-    if action == "list":
+    if action in ("list", "update"):
         pass
     elif action == "search":
         args = [argv.pop(0)]
         kwargs = {k.lstrip("-"): v for k, v in zip(argv[::2], argv[1::2])}
-    elif action == "install":
+    elif action in ("install", "pack", "addpath"):
         args = [argv.pop(0)]
+    elif action == "sync":
+        dry_run = "--dry_run" in argv
+        if dry_run:
+            argv.remove("--dry_run")
+        args = argv[:1]
+        kwargs = {"dry_run": dry_run}
+    elif action == "verify":
+        kwargs = {"repair_files": "--repair" in argv}
     elif action == "config":
         try:
             kwargs = {"action": argv[0], "path": argv[1]}
@@ -117,25 +548,105 @@ def parse_args():
     else:
         raise CliError(f"Action '{action}' is not supported")
 
-    return game_slug, action, args, kwargs
+    return game_slug, action, args, kwargs, output_format
+
 
+def run_action(
+    game_slug: str,
+    action: str,
+    args: list,
+    kwargs: dict,
+    writer: Writer,
+    get_cli: Optional[Callable[[str], CurseCli]] = None,
+):
+    """Run action for one or several games.
 
-def run_cli():
+    get_cli returns a CurseCli for a game slug. Long running processes provide one
+    which reuses CurseCli instances together with their installed game state.
+    """
+    if get_cli is not None:
+        return _run_action(game_slug, action, args, kwargs, writer, get_cli)
+
+    api = API()
     try:
-        game_slug, action, args, kwargs = parse_args()
+        _run_action(
+            game_slug,
+            action,
+            args,
+            kwargs,
+            writer,
+            lambda slug: CurseCli(slug, api=api),
+        )
+    finally:
+        api.close()
 
-        cli = CurseCli(game_slug)
 
-        if action == "list":
-            cli.list()
-        elif action == "search":
-            cli.search(*args, **kwargs)
-        elif action == "install":
-            cli.install(*args, **kwargs)
-        elif action == "config":
-            cli.config(*args, **kwargs)
+def _run_action(
+    game_slug: str,
+    action: str,
+    args: list,
+    kwargs: dict,
+    writer: Writer,
+    get_cli: Callable[[str], CurseCli],
+):
+    game_slugs = parse_game_slugs(game_slug)
+    clis = [get_cli(slug) for slug in game_slugs]
+    for cli in clis:
+        cli.writer = writer
+
+    if len(clis) > 1:
+        if action not in ("list", "search", "update", "sync", "verify"):
+            raise CliError(f"Action '{action}' supports only a single game")
+        cli = MultiCurseCli(clis, writer=writer)
+    else:
+        cli = clis[0]
+
+    if action == "list":
+        cli.list()
+    elif action == "search":
+        cli.search(*args, **kwargs)
+    elif action == "install":
+        cli.install(*args, **kwargs)
+    elif action == "pack":
+        cli.install_pack(*args, **kwargs)
+    elif action == "addpath":
+        cli.add_path(*args, **kwargs)
+    elif action == "update":
+        cli.update(*args, **kwargs)
+    elif action == "sync":
+        cli.sync(*args, **kwargs)
+    elif action == "verify":
+        cli.verify(*args, **kwargs)
+    elif action == "config":
+        cli.config(*args, **kwargs)
+
+
+def run_cli(
+    argv: Optional[List[str]] = None,
+    get_cli: Optional[Callable[[str], CurseCli]] = None,
+):
+    if not sys.stdout.isatty():
+        colors.disable()
+
+    try:
+        game_slug, action, args, kwargs, output_format = parse_args(
+            sys.argv[1:] if argv is None else argv
+        )
     except CliError as ce:
         print(f"[ERROR] {ce}. Exiting...")
+        return
+
+    writer = Writer(output_format, stream=sys.stdout)
+    # keep stdout clean for machine readable records
+    log_stream = sys.stdout if output_format == OUTPUT_FORMAT.TABLE else sys.stderr
+
+    with redirect_stdout(log_stream):
+        try:
+            run_action(game_slug, action, args, kwargs, writer, get_cli)
+        except CliError as ce:
+            print(f"[ERROR] {ce}. Exiting...")
+        finally:
+            writer.close()
 
 
 if __name__ == "__main__":
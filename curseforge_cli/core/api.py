@@ -1,12 +1,37 @@
 from ..core.utils import resolve_addon_path
-from io import BytesIO
+import asyncio
+import itertools
+import os
 from pathlib import Path
-from typing import List
-from zipfile import ZipFile
+from threading import Thread
+import time
+from typing import Dict, Iterable, List, Optional
+from zipfile import BadZipFile
 
-from requests import Session
+from ..core.archive import MappedZip
+from ..core.game import Game
+from ..core.model import AddonFile, AddonInfo, GameInfo
+from ..core.transport import Transport, make_transport
 
-from ..core.model import AddonInfo, GameInfo
+_part_ids = itertools.count()
+
+ARCHIVES_PATH = Path("./appdata/archives")
+
+
+def archive_path(file_id: int) -> Path:
+    """Where the archive of an addon file is cached"""
+    return ARCHIVES_PATH / f"{file_id}.zip"
+
+
+def is_valid_archive(path: Path) -> bool:
+    """Whether path is a readable zip. Checks the central directory only, a
+    truncated or overwritten archive loses it
+    """
+    try:
+        MappedZip(path).close()
+        return True
+    except (OSError, BadZipFile):
+        return False
 
 
 class SORT_TYPE:
@@ -28,80 +53,228 @@ def _apply_filter(row: dict, game_flavor: str = None):
         latest_files.append(f)
 
     if latest_files:
-        row["latestFiles"] = latest_files
-        return AddonInfo.from_api(row)
+        # rows are shared between game flavors via the cache, so never mutate them
+        return AddonInfo.from_api({**row, "latestFiles": latest_files})
 
 
-class API:
-    def __init__(self) -> None:
+class AsyncAPI:
+    def __init__(self, transport: Transport, cache_ttl: Optional[float] = None) -> None:
+        """Curseforge API client core. Methods are coroutines, fan-outs are gathered
+        in one event loop instead of running a thread per request.
+
+        Args:
+            transport (Transport): Sends the requests
+            cache_ttl (Optional[float], optional): Seconds to keep API responses.
+                Defaults to None which keeps them for the lifetime of the instance.
+        """
         self.base_url = "https://addons-ecs.forgesvc.net/api/v2"
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36"
         }
+        self.transport = transport
 
-    def get_game_info(self, id: int) -> GameInfo:
-        with Session() as session:
-            r = session.get(f"{self.base_url}/game/{id}", headers=self.headers)
-            data = r.json()
+        self.cache_ttl = cache_ttl
+        self._json_cache = {}
+        self._pending = {}
+
+    async def _shared(self, key, factory):
+        """Await factory() once for concurrent calls with the same key"""
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # one caller giving up must not cancel the others
+        return await asyncio.shield(task)
+
+    async def _get_json(self, url: str, max_age: Optional[float] = None):
+        """GET url once per API instance. Several game flavors share the same
+        curseforge game id, so game info, addons and search results are fetched
+        once and filtered per flavor afterwards. Concurrent calls for the same url
+        share one request.
+
+        max_age limits the age of a cached response further than cache_ttl,
+        0 always fetches it again.
+        """
+        cached = self._json_cache.get(url)
+        limits = [t for t in (self.cache_ttl, max_age) if t is not None]
+
+        if cached is None or (limits and time.monotonic() - cached[0] > min(limits)):
+
+            async def _fetch():
+                # concurrent calls share this request through _shared, later ones
+                # find the response in the cache
+                data = await self.transport.get_json(url, self.headers)
+                self._json_cache[url] = (time.monotonic(), data)
+                return data
+
+            return await self._shared(url, _fetch)
+
+        return cached[1]
+
+    async def get_game_info(self, id: int) -> GameInfo:
+        data = await self._get_json(f"{self.base_url}/game/{id}")
 
         return GameInfo.from_api(data)
 
-    def get_addon(self, id: int, game_flavor: str = None):
-        with Session() as session:
-            r = session.get(f"{self.base_url}/addon/{id}", headers=self.headers)
-            data = r.json()
+    async def get_addon(
+        self, id: int, game_flavor: str = None, max_age: Optional[float] = None
+    ):
+        data = await self._get_json(f"{self.base_url}/addon/{id}", max_age)
 
         addon = _apply_filter(data, game_flavor)
         if addon:
             return addon
 
-    def download_addon(
-        self, id: int, installed_game_path: Path, game_flavor: str = None
-    ):
-        addon = self.get_addon(id, game_flavor)
+    async def get_addons(
+        self,
+        ids: Iterable[int],
+        game_flavor: str = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[int, AddonInfo]:
+        """Concurrently fetch addons. Addons that failed to load are omitted"""
+        ids = list(set(ids))
+        results = await asyncio.gather(
+            *(self.get_addon(id, game_flavor, max_age) for id in ids),
+            return_exceptions=True,
+        )
+
+        return {
+            id: addon
+            for id, addon in zip(ids, results)
+            if addon and not isinstance(addon, Exception)
+        }
+
+    async def get_addon_file(self, id: int, file_id: int) -> AddonFile:
+        data = await self._get_json(f"{self.base_url}/addon/{id}/file/{file_id}")
+
+        return AddonFile.from_api(data)
 
-        modules = ", ".join(addon.latest_file.modules)
+    async def download_addon(
+        self,
+        id: int,
+        installed_game_path: Path,
+        game: Game,
+        addon_file: Optional[AddonFile] = None,
+    ) -> Optional[AddonFile]:
+        """Download and install addon_file, the latest file by default, the way game
+        installs its addons. Returns the installed file or None if installing failed.
+        """
+        addon = await self.get_addon(id, game.slug)
+        addon_file = addon_file or addon.latest_file
+
+        modules = ", ".join(addon_file.modules)
         print(
-            f"Downloading {addon.name} [{modules}] from {addon.latest_file.file_date:%d %b %Y}"
+            f"Downloading {addon.name} [{modules}] from {addon_file.file_date:%d %b %Y}"
         )
 
-        extract_path = resolve_addon_path(
+        section_path = resolve_addon_path(
             installed_game_path, addon.category_section.path
         )
 
-        with Session() as session:
-            r = session.get(addon.latest_file.url, headers=self.headers, stream=True)
+        archive_path = await self.download_archive(addon_file)
+        if not archive_path:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, game.install_archive, archive_path, section_path, addon_file
+            )
 
-        from tqdm import tqdm
+            print(f"Installed {addon.name} to {section_path.absolute()}")
+        except Exception as e:
+            print(f"Failed to install {addon.name} because {type(e)}: {e}")
+            return
 
-        total_size_in_bytes = int(r.headers.get("content-length", 0))
-        chunk_size = 1024  # 1 Kibibyte
-        progress_bar = tqdm(total=total_size_in_bytes, unit="iB", unit_scale=True)
+        return addon_file
 
-        zip_io = BytesIO()
+    async def download_addons(
+        self,
+        ids: Iterable[int],
+        installed_game_path: Path,
+        game: Game,
+    ) -> Dict[int, Optional[AddonFile]]:
+        """Concurrently download and install the latest files of addons.
+        Returns {id: installed file or None if it failed}
+        """
+
+        async def _download(id: int):
+            try:
+                return await self.download_addon(id, installed_game_path, game)
+            except Exception as e:
+                print(f"Failed to install #{id} because {type(e)}: {e}")
+
+        ids = list(dict.fromkeys(ids))
+        results = await asyncio.gather(*(_download(id) for id in ids))
+
+        return dict(zip(ids, results))
+
+    async def download_archive(
+        self, addon_file: AddonFile, progress: bool = True
+    ) -> Optional[Path]:
+        """Download addon_file archive into appdata, unless a valid one is already there.
+        Returns None if the download failed.
+        """
+        path = archive_path(addon_file.id)
+        if path.exists() and not is_valid_archive(path):
+            print(
+                f"Cached archive of {addon_file.file_name} is broken, downloading again"
+            )
+            path.unlink()
+
+        return await self.download_file(addon_file, path, progress)
+
+    async def download_file(
+        self, addon_file: AddonFile, path: Path, progress: bool = True
+    ) -> Optional[Path]:
+        """Download addon_file to path, unless it is already there.
+        Concurrent downloads to the same path share one request.
+        Returns None if the download failed.
+        """
+        if path.exists():
+            return path
+
+        return await self._shared(
+            path, lambda: self._download_file(addon_file, path, progress)
+        )
 
-        for chunk in r.iter_content(chunk_size):
-            progress_bar.update(len(chunk))
-            zip_io.write(chunk)
+    async def _download_file(
+        self, addon_file: AddonFile, path: Path, progress: bool
+    ) -> Optional[Path]:
+        path.parent.mkdir(parents=True, exist_ok=True)
 
-        progress_bar.close()
+        progress_bar = None
+        if progress:
+            from tqdm import tqdm
 
-        if total_size_in_bytes != 0 and progress_bar.n != total_size_in_bytes:
-            print("ERROR, downloading went wrong")
+            progress_bar = tqdm(unit="iB", unit_scale=True)
 
-        zip_io.seek(0)
+        # unique per download, other processes may download the same file at once
+        part_path = path.with_name(f"{path.name}.{os.getpid()}.{next(_part_ids)}.part")
 
         try:
-            print(f"Extracting to {extract_path.absolute()}... ", end="")
+            total_size_in_bytes, written = await self.transport.download(
+                addon_file.url, part_path, self.headers, progress_bar
+            )
+        except BaseException:
+            if part_path.exists():
+                part_path.unlink()
+            raise
+        finally:
+            if progress_bar is not None:
+                progress_bar.close()
 
-            with ZipFile(zip_io, "r") as zip_f:
-                zip_f.extractall(extract_path)
+        if total_size_in_bytes != 0 and written != total_size_in_bytes:
+            print(f"ERROR, downloading {addon_file.file_name} went wrong")
+            part_path.unlink()
+            return
 
-            print("Done")
-        except Exception as e:
-            print(f"Failed because {type(e)}: {e}")
+        os.replace(part_path, path)
 
-    def search_addon(
+        return path
+
+    async def search_addon(
         self,
         query: str,
         game_id: int,
@@ -119,12 +292,7 @@ class API:
         }
         kwargs_str = "&".join(f"{k}={v}" for k, v in kwargs.items())
 
-        with Session() as session:
-            r = session.get(
-                f"{self.base_url}/addon/search?{kwargs_str}",
-                headers=self.headers,
-            )
-            data = r.json()
+        data = await self._get_json(f"{self.base_url}/addon/search?{kwargs_str}")
 
         results = []
 
@@ -134,3 +302,86 @@ class API:
                 results.append(addon)
 
         return results
+
+
+class API:
+    def __init__(
+        self, cache_ttl: Optional[float] = None, transport: Optional[str] = None
+    ) -> None:
+        """Curseforge API client. Runs AsyncAPI in an event loop of its own, so it can
+        be called from any thread.
+
+        Args:
+            cache_ttl (Optional[float], optional): Seconds to keep API responses.
+                Defaults to None which keeps them for the lifetime of the instance.
+            transport (Optional[str], optional): One of TRANSPORT.
+                Defaults to None which picks HTTP/2 if it is installed.
+        """
+        self.core = AsyncAPI(make_transport(transport), cache_ttl)
+        self.base_url = self.core.base_url
+
+        self._loop = asyncio.new_event_loop()
+        Thread(target=self._loop.run_forever, name="api", daemon=True).start()
+
+    def run(self, coro):
+        """Run a coroutine in the API event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_game_info(self, id: int) -> GameInfo:
+        return self.run(self.core.get_game_info(id))
+
+    def get_addon(
+        self, id: int, game_flavor: str = None, max_age: Optional[float] = None
+    ):
+        return self.run(self.core.get_addon(id, game_flavor, max_age))
+
+    def get_addons(
+        self,
+        ids: Iterable[int],
+        game_flavor: str = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[int, AddonInfo]:
+        return self.run(self.core.get_addons(ids, game_flavor, max_age))
+
+    def get_addon_file(self, id: int, file_id: int) -> AddonFile:
+        return self.run(self.core.get_addon_file(id, file_id))
+
+    def download_addon(
+        self,
+        id: int,
+        installed_game_path: Path,
+        game: Game,
+        addon_file: Optional[AddonFile] = None,
+    ) -> Optional[AddonFile]:
+        return self.run(
+            self.core.download_addon(id, installed_game_path, game, addon_file)
+        )
+
+    def download_addons(
+        self, ids: Iterable[int], installed_game_path: Path, game: Game
+    ) -> Dict[int, Optional[AddonFile]]:
+        return self.run(self.core.download_addons(ids, installed_game_path, game))
+
+    def download_archive(
+        self, addon_file: AddonFile, progress: bool = True
+    ) -> Optional[Path]:
+        return self.run(self.core.download_archive(addon_file, progress))
+
+    def search_addon(
+        self,
+        query: str,
+        game_id: int,
+        game_flavor: str,
+        game_version: str = "",
+        page_size: int = 500,
+        sort: SORT_TYPE = SORT_TYPE.POPULARITY,
+    ) -> List[AddonInfo]:
+        return self.run(
+            self.core.search_addon(
+                query, game_id, game_flavor, game_version, page_size, sort
+            )
+        )
+
+    def close(self):
+        self.run(self.core.transport.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,256 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import mmap
+import os
+from pathlib import Path, PurePosixPath
+import shutil
+import struct
+from typing import Iterable, List, NamedTuple, Optional
+from zipfile import BadZipFile, ZipFile
+import zlib
+
+CHUNK_SIZE = 1024 * 1024
+
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD64_LOCATOR = struct.Struct("<4sLQL")
+_EOCD64 = struct.Struct("<4sQ2H2L4Q")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+_STORED = 0
+_DEFLATED = 8
+_ENCRYPTED = 0x1
+_UTF8 = 0x800
+
+
+class ZipMember(NamedTuple):
+    name: str
+    method: int
+    flags: int
+    crc: int
+    compressed_size: int
+    file_size: int
+    header_offset: int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+def _zip64_values(extra: bytes, count: int) -> List[int]:
+    """Sizes and offset stored in the zip64 extra field"""
+    i = 0
+    while i + 4 <= len(extra):
+        tag, size = struct.unpack_from("<2H", extra, i)
+        if tag == 0x0001:
+            return list(struct.unpack_from(f"<{count}Q", extra, i + 4))
+        i += 4 + size
+
+    raise BadZipFile("Missing zip64 extra field")
+
+
+def _safe_path(dest: Path, name: str) -> Optional[Path]:
+    """Join name to dest the way ZipFile.extract does, dropping absolute parts and .."""
+    name = os.path.splitdrive(name.replace("\\", "/"))[1]
+    parts = [p for p in PurePosixPath(name).parts if p not in ("/", ".", "..")]
+
+    return dest.joinpath(*parts) if parts else None
+
+
+class MappedZip:
+    def __init__(self, path: Path) -> None:
+        """Zip archive read through a memory map.
+
+        Only the central directory is parsed up front. Members are decompressed straight
+        from the mapped pages in bounded chunks, so memory use does not depend on the
+        archive size and members can be extracted from several threads at once.
+        """
+        self.path = path
+        self._file = path.open("rb")
+
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BadZipFile(f"{path} is empty")
+
+        try:
+            self.members = self._read_central_directory()
+        except (BadZipFile, struct.error) as e:
+            self.close()
+            raise BadZipFile(f"{path} is not a zip file: {e}")
+
+    def _read_central_directory(self) -> List[ZipMember]:
+        mm = self._map
+
+        # the end of central directory record is followed by a comment up to 64 KiB
+        eocd_pos = mm.rfind(b"PK\x05\x06", max(0, len(mm) - _EOCD.size - 0xFFFF))
+        if eocd_pos < 0:
+            raise BadZipFile("End of central directory not found")
+
+        _, _, _, _, count, cd_size, cd_offset, _ = _EOCD.unpack_from(mm, eocd_pos)
+
+        if 0xFFFF == count or 0xFFFFFFFF in (cd_size, cd_offset):
+            sig, _, eocd64_pos, _ = _EOCD64_LOCATOR.unpack_from(
+                mm, eocd_pos - _EOCD64_LOCATOR.size
+            )
+            if sig != b"PK\x06\x07":
+                raise BadZipFile("Zip64 end of central directory not found")
+            values = _EOCD64.unpack_from(mm, eocd64_pos)
+            count, cd_size, cd_offset = values[7], values[8], values[9]
+
+        members = []
+        pos = cd_offset
+
+        for _ in range(count):
+            header = _CENTRAL_HEADER.unpack_from(mm, pos)
+            if header[0] != b"PK\x01\x02":
+                raise BadZipFile("Bad central directory entry")
+
+            flags, method, crc, compressed_size, file_size = (
+                header[3],
+                header[4],
+                header[7],
+                header[8],
+                header[9],
+            )
+            name_len, extra_len, comment_len, header_offset = (
+                header[10],
+                header[11],
+                header[12],
+                header[16],
+            )
+
+            pos += _CENTRAL_HEADER.size
+            name = bytes(mm[pos : pos + name_len])
+            extra = bytes(mm[pos + name_len : pos + name_len + extra_len])
+            pos += name_len + extra_len + comment_len
+
+            large = [file_size, compressed_size, header_offset]
+            masked = [v == 0xFFFFFFFF for v in large]
+            if any(masked):
+                values = iter(_zip64_values(extra, sum(masked)))
+                file_size, compressed_size, header_offset = [
+                    next(values) if m else v for v, m in zip(large, masked)
+                ]
+
+            members.append(
+                ZipMember(
+                    name=name.decode("utf-8" if flags & _UTF8 else "cp437"),
+                    method=method,
+                    flags=flags,
+                    crc=crc,
+                    compressed_size=compressed_size,
+                    file_size=file_size,
+                    header_offset=header_offset,
+                )
+            )
+
+        return members
+
+    def _data_offset(self, member: ZipMember) -> int:
+        header = _LOCAL_HEADER.unpack_from(self._map, member.header_offset)
+        if header[0] != b"PK\x03\x04":
+            raise BadZipFile(f"Bad local header of {member.name}")
+
+        return member.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+
+    def _copy(self, member: ZipMember, out_f):
+        """Decompress member into out_f chunk by chunk and check its CRC"""
+        if member.flags & _ENCRYPTED or member.method not in (_STORED, _DEFLATED):
+            # rare, leave encryption and bzip2/lzma to zipfile
+            with ZipFile(self.path) as zip_f, zip_f.open(member.name) as src:
+                shutil.copyfileobj(src, out_f, CHUNK_SIZE)
+            return
+
+        start = self._data_offset(member)
+        end = start + member.compressed_size
+        crc = 0
+
+        # every view must be released before the map can be closed
+        with memoryview(self._map) as view, view[start:end] as data:
+            if member.method == _STORED:
+                for i in range(0, len(data), CHUNK_SIZE):
+                    with data[i : i + CHUNK_SIZE] as chunk:
+                        crc = zlib.crc32(chunk, crc)
+                        out_f.write(chunk)
+            else:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                for i in range(0, len(data), CHUNK_SIZE):
+                    # max_length bounds the output of highly compressed chunks
+                    chunk = decompressor.decompress(
+                        data[i : i + CHUNK_SIZE], CHUNK_SIZE
+                    )
+                    while chunk:
+                        crc = zlib.crc32(chunk, crc)
+                        out_f.write(chunk)
+                        chunk = decompressor.decompress(
+                            decompressor.unconsumed_tail, CHUNK_SIZE
+                        )
+                chunk = decompressor.flush()
+                crc = zlib.crc32(chunk, crc)
+                out_f.write(chunk)
+
+        if crc != member.crc:
+            raise BadZipFile(f"Bad CRC-32 for {member.name}")
+
+    def read(self, member: ZipMember) -> bytes:
+        """Whole member content, meant for small files like manifests"""
+        buffer = BytesIO()
+        self._copy(member, buffer)
+
+        return buffer.getvalue()
+
+    def find(self, name: str) -> Optional[ZipMember]:
+        return next((m for m in self.members if m.name == name), None)
+
+    def extract(self, member: ZipMember, dest: Path, strip: str = "") -> Optional[Path]:
+        """Extract member into dest, with strip removed from the start of its name"""
+        target = _safe_path(dest, member.name[len(strip) :])
+        if target is None:
+            return
+
+        if member.is_dir:
+            target.mkdir(parents=True, exist_ok=True)
+            return target
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with target.open("wb") as out_f:
+            self._copy(member, out_f)
+
+        return target
+
+    def extract_all(
+        self,
+        dest: Path,
+        members: Optional[Iterable[ZipMember]] = None,
+        strip: str = "",
+        max_workers: Optional[int] = None,
+    ):
+        """Extract members, all by default, in parallel.
+
+        zlib and file writes release the GIL, so threads decompress on every core.
+
+        Args:
+            dest (Path): Folder to extract into
+            members (Optional[Iterable[ZipMember]], optional): Defaults to all members.
+            strip (str, optional): Prefix removed from member names. Defaults to "".
+            max_workers (Optional[int], optional): Defaults to the number of cores.
+        """
+        members = self.members if members is None else list(members)
+        # the biggest members first, so no thread is left with a huge one at the end
+        members = sorted(members, key=lambda m: m.compressed_size, reverse=True)
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            for _ in executor.map(lambda m: self.extract(m, dest, strip), members):
+                pass
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "MappedZip":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
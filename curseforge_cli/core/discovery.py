@@ -0,0 +1,259 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import re
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Wine prefixes created by wine itself, winetricks, Steam Proton, Lutris and Bottles.
+# Patterns are relative to the home directory.
+PREFIX_PATTERNS = [
+    ".wine",
+    ".local/share/wineprefixes/*",
+    ".steam/steam/steamapps/compatdata/*/pfx",
+    ".local/share/Steam/steamapps/compatdata/*/pfx",
+    ".var/app/com.valvesoftware.Steam/.local/share/Steam/steamapps/compatdata/*/pfx",
+    "Games/*",
+    ".local/share/lutris/prefixes/*",
+    ".local/share/bottles/bottles/*",
+    ".var/app/com.usebottles.bottles/data/bottles/bottles/*",
+]
+
+# Folders of PREFIX_PATTERNS which hold nothing but prefixes. New prefixes appear in
+# them, unlike in the home directory or ~/Games, which change all the time.
+PREFIX_CONTAINERS = [
+    ".local/share/wineprefixes",
+    ".steam/steam/steamapps/compatdata",
+    ".local/share/Steam/steamapps/compatdata",
+    ".var/app/com.valvesoftware.Steam/.local/share/Steam/steamapps/compatdata",
+    ".local/share/lutris/prefixes",
+    ".local/share/bottles/bottles",
+    ".var/app/com.usebottles.bottles/data/bottles/bottles",
+]
+
+# Minecraft runs natively, these are game folders of the official launcher and of the
+# common third party launchers. Patterns are relative to the home directory.
+MINECRAFT_PATTERNS = [
+    ".minecraft",
+    ".var/app/com.mojang.Minecraft/.minecraft",
+    "Library/Application Support/minecraft",
+    ".local/share/PrismLauncher/instances/*/.minecraft",
+    ".local/share/PrismLauncher/instances/*/minecraft",
+    ".var/app/org.prismlauncher.PrismLauncher/data/PrismLauncher/instances/*/.minecraft",
+    ".var/app/org.prismlauncher.PrismLauncher/data/PrismLauncher/instances/*/minecraft",
+    ".local/share/multimc/instances/*/.minecraft",
+    ".local/share/ATLauncher/instances/*",
+    "curseforge/minecraft/Instances/*",
+]
+
+SKIP_DIRS = {"windows", "$recycle.bin"}  # huge and never contain games
+
+CACHE_PATH = Path("./appdata/discovery_cache.json")
+_cache_lock = Lock()
+
+
+def _expand_patterns(home: Path, patterns: Iterable[str]) -> List[Path]:
+    paths = []
+    for pattern in patterns:
+        if "*" in pattern:
+            paths.extend(sorted(home.glob(pattern)))
+        else:
+            paths.append(home / pattern)
+
+    return paths
+
+
+def find_wine_prefixes(home: Optional[Path] = None) -> List[Path]:
+    home = home or Path("~").expanduser()
+
+    candidates = [Path(os.environ["WINEPREFIX"])] if "WINEPREFIX" in os.environ else []
+    candidates.extend(_expand_patterns(home, PREFIX_PATTERNS))
+
+    prefixes = []
+    for c in candidates:
+        if (c / "drive_c").is_dir() and c not in prefixes:
+            prefixes.append(c)
+
+    return prefixes
+
+
+def find_minecraft_instances(home: Optional[Path] = None) -> List[Path]:
+    """Native Minecraft game folders of the official launcher and launcher instances"""
+    home = home or Path("~").expanduser()
+
+    return [p for p in _expand_patterns(home, MINECRAFT_PATTERNS) if p.is_dir()]
+
+
+def _prefix_users(prefix: Path) -> List[Path]:
+    try:
+        with os.scandir(prefix / "drive_c" / "users") as entries:
+            return [
+                Path(e.path)
+                for e in entries
+                if e.is_dir(follow_symlinks=False) and e.name.lower() != "public"
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def _prefix_variables(prefix: Path) -> Dict[str, List[Path]]:
+    drive_c = prefix / "drive_c"
+    users = _prefix_users(prefix)
+
+    return {
+        "PROGRAMFILES": [drive_c / "Program Files"],
+        "PROGRAMFILES(X86)": [drive_c / "Program Files (x86)"],
+        "PROGRAMDATA": [drive_c / "ProgramData"],
+        "ALLUSERSPROFILE": [drive_c / "ProgramData"],
+        "USERPROFILE": users,
+        "APPDATA": [u / "AppData" / "Roaming" for u in users],
+        "LOCALAPPDATA": [u / "AppData" / "Local" for u in users],
+        "MYDOCUMENTS": [u / d for u in users for d in ("Documents", "My Documents")],
+    }
+
+
+def expand_windows_path(path: str, prefix: Path) -> List[Path]:
+    """Map a windows path like %PROGRAMFILES(X86)%\\Game or C:\\Game into a wine prefix"""
+    parts = [p for p in re.split(r"[\\/]+", path) if p]
+    if not parts:
+        return []
+
+    root, rest = parts[0], parts[1:]
+
+    if root.startswith("%") and root.endswith("%"):
+        bases = _prefix_variables(prefix).get(root.strip("%").upper(), [])
+    elif re.fullmatch(r"[a-zA-Z]:", root):
+        # dosdevices links every drive letter to a real folder, c: is drive_c
+        bases = [prefix / "dosdevices" / root.lower()]
+    else:
+        return []
+
+    return [base.joinpath(*rest) for base in bases]
+
+
+def _scan(path: Path, names: Set[str], max_depth: int) -> Tuple[list, dict]:
+    """Walk path up to max_depth levels deep without following symlinks.
+
+    Returns folders named like one of names and mtimes of every visited folder.
+    """
+    matches = []
+    visited = {}
+    stack = [(path, 0)]
+
+    while stack:
+        current, depth = stack.pop()
+
+        try:
+            visited[str(current)] = current.stat().st_mtime_ns
+            with os.scandir(current) as entries:
+                subdirs = [e for e in entries if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            continue
+
+        for e in subdirs:
+            name = e.name.lower()
+            if name in names:
+                matches.append(str(Path(e.path)))
+            elif depth < max_depth and name not in SKIP_DIRS:
+                stack.append((Path(e.path), depth + 1))
+
+    return matches, visited
+
+
+def _cache_key(names: Iterable[str], roots: Iterable[Path]) -> str:
+    return "|".join(sorted(names)) + "@" + "|".join(sorted(str(r) for r in roots))
+
+
+def _load_cache() -> dict:
+    try:
+        with CACHE_PATH.open("r") as cache_f:
+            return json.load(cache_f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_cache(key: str, entry: dict):
+    with _cache_lock:
+        cache = _load_cache()
+        cache[key] = entry
+
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CACHE_PATH.with_suffix(".tmp")
+        with tmp_path.open("w") as cache_f:
+            json.dump(cache, cache_f)
+        os.replace(tmp_path, CACHE_PATH)
+
+
+def _mtime(path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _is_valid(entry: dict) -> bool:
+    # missing folders are recorded as None, they must still be missing
+    for path, mtime in entry["visited"].items():
+        if _mtime(path) != mtime:
+            return False
+
+    return all(os.path.isdir(p) for p in entry["matches"])
+
+
+def search_prefixes(
+    names: Iterable[str],
+    prefixes: Optional[List[Path]] = None,
+    max_depth: int = 4,
+    max_workers: int = 16,
+) -> List[Path]:
+    """Find folders named like one of names inside wine prefixes.
+
+    Results are cached in appdata and reused while none of the scanned folders changed.
+
+    Args:
+        names (Iterable[str]): Folder names, case insensitive
+        prefixes (Optional[List[Path]], optional): Defaults to find_wine_prefixes().
+        max_depth (int, optional): Folder levels below drive_c to scan. Defaults to 4.
+        max_workers (int, optional): Scanning threads. Defaults to 16.
+    """
+    names = {n.lower() for n in names}
+    prefixes = find_wine_prefixes() if prefixes is None else prefixes
+
+    if not names or not prefixes:
+        return []
+
+    key = _cache_key(names, prefixes)
+    cached = _load_cache().get(key)
+
+    if cached and _is_valid(cached):
+        return [Path(p) for p in cached["matches"]]
+
+    # prefix containers are recorded too, so new prefixes invalidate the cache
+    home = Path("~").expanduser()
+    visited = {str(home / c): _mtime(home / c) for c in PREFIX_CONTAINERS}
+    for prefix in prefixes:
+        visited[str(prefix)] = _mtime(prefix)
+
+    roots = []
+    for prefix in prefixes:
+        drive_c = prefix / "drive_c"
+        visited[str(drive_c)] = drive_c.stat().st_mtime_ns
+        with os.scandir(drive_c) as entries:
+            roots.extend(
+                Path(e.path)
+                for e in entries
+                if e.is_dir(follow_symlinks=False) and e.name.lower() not in SKIP_DIRS
+            )
+
+    matches = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda r: _scan(r, names, max_depth - 1), roots)
+
+        for root_matches, root_visited in results:
+            matches.extend(root_matches)
+            visited.update(root_visited)
+
+    _update_cache(key, {"matches": matches, "visited": visited})
+
+    return [Path(p) for p in matches]
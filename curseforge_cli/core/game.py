@@ -1,10 +1,27 @@
 from ..core.utils import resolve_addon_path
+from datetime import datetime
+import json
+import os
 from pathlib import Path
-from typing import List, Optional
-import winreg
+import re
+import shutil
+from typing import Dict, List, Optional, Set
 from zipfile import ZipFile
 
+try:
+    import winreg
+except ImportError:
+    winreg = None  # not on Windows, games are searched in wine prefixes instead
+
+from ..core.archive import MappedZip
+from ..core.discovery import (
+    expand_windows_path,
+    find_minecraft_instances,
+    find_wine_prefixes,
+    search_prefixes,
+)
 from ..core.model import (
+    AddonFile,
     AddonLocalInfo,
     CategorySection,
     GameDetectionHint,
@@ -39,6 +56,9 @@ class NoFoldersFound(Exception):
 
 
 def search_registry(reg_key: str, reg_value: str) -> Path:
+    if winreg is None:
+        return
+
     try:
         if reg_key.startswith("HKEY_LOCAL_MACHINE"):
             reg_key = reg_key[len("HKEY_LOCAL_MACHINE") :].strip("\\")
@@ -72,11 +92,32 @@ def search_registry(reg_key: str, reg_value: str) -> Path:
         return
 
 
-def search_directory(path) -> Path:
-    return
+def search_directory(path: str) -> List[Path]:
+    """Find existing folders matching a windows path like %PROGRAMFILES%\\Game.
+    Outside of Windows the path is looked up in every wine prefix.
+    """
+    if winreg is None:
+        return [
+            p
+            for prefix in find_wine_prefixes()
+            for p in expand_windows_path(path, prefix)
+            if p.is_dir()
+        ]
+
+    env = {k.upper(): v for k, v in os.environ.items()}
+    env.setdefault("MYDOCUMENTS", str(Path("~").expanduser() / "Documents"))
+
+    expanded = Path(
+        re.sub(r"%([^%]+)%", lambda m: env.get(m.group(1).upper(), m.group(0)), path)
+    )
+
+    return [expanded] if expanded.is_dir() else []
 
 
 class Game:
+    manifest_pattern = None  # glob of addon manifest files, e.g. *.toc
+    single_file_addons = False  # addons are the downloaded files themselves
+
     def __init__(
         self, curse_id: int, slug: str, game_folder_ending: Optional[str] = None
     ) -> None:
@@ -108,6 +149,19 @@ class Game:
     def import_config(self, installed_game_path: Path, import_path: Path):
         raise NotImplementedError(f"Override import_config method in {type(self)}")
 
+    def is_addon_path(self, path: Path) -> bool:
+        """Addons are folders by default"""
+        return path.is_dir()
+
+    def install_archive(
+        self, archive_path: Path, section_path: Path, addon_file: AddonFile
+    ):
+        """Install a downloaded addon file into its category section folder.
+        Archives are extracted by default.
+        """
+        with MappedZip(archive_path) as zip_f:
+            zip_f.extract_all(section_path)
+
     def _discover_addons(self, path: Path, category_sections: List[CategorySection]):
         local_addons = []
 
@@ -115,31 +169,67 @@ class Game:
             cat_path = resolve_addon_path(path, cat.path)
 
             for addon_path in cat_path.glob("*"):
-                local_info = self.get_addon_local_info(addon_path)
-                addon = InstalledAddon(local_info=local_info)
-                local_addons.append(addon)
+                if not self.is_addon_path(addon_path):
+                    continue
+
+                try:
+                    local_addons.append(self.load_addon(addon_path))
+                except IndexError:
+                    pass  # no manifest, e.g. a broken install
 
         return local_addons
 
+    def load_addon(self, addon_path: Path) -> InstalledAddon:
+        local_info = self.get_addon_local_info(addon_path)
+        # folder mtime is the best guess we have for addons installed by other tools
+        date_installed = datetime.utcfromtimestamp(addon_path.stat().st_mtime)
+
+        return InstalledAddon(local_info=local_info, date_installed=date_installed)
+
+    def _game_folder_names(self, hints: List[GameDetectionHint]) -> Set[str]:
+        """Folder names to look for when scanning wine prefixes"""
+        if self.game_folder_ending:
+            return {self.game_folder_ending}
+
+        names = set()
+        for h in hints:
+            if h.type == 2:
+                name = re.split(r"[\\/]+", h.path.rstrip("\\/"))[-1]
+                if not name.startswith("%"):
+                    names.add(name)
+
+        return names
+
+    def _game_folder(self, game_dir: Path) -> Optional[Path]:
+        if not self.game_folder_ending or game_dir.name == self.game_folder_ending:
+            return game_dir.resolve()
+        elif (game_dir / self.game_folder_ending).is_dir():
+            return (game_dir / self.game_folder_ending).resolve()
+
+    def _native_game_dirs(self) -> List[Path]:
+        """Game folders of a native install outside of Windows. None by default,
+        the game is searched in Wine prefixes only
+        """
+        return []
+
     def _discover_game_path(self, hints: List[GameDetectionHint]) -> Path:
         possible_results = []
 
         for h in hints:
-            game_dir = None
-
             if h.type == 1:
-                game_dir = search_registry(h.path, h.key)
+                game_dirs = [search_registry(h.path, h.key)]
             elif h.type == 2:
-                game_dir = search_directory(h.path)
+                game_dirs = search_directory(h.path)
             else:
                 raise ValueError(f"Unknown hint type {h.type}")
 
-            if game_dir:
-                if self.game_folder_ending and game_dir.name != self.game_folder_ending:
-                    continue
-                possible_results.append(game_dir)
+            possible_results.extend(d for d in game_dirs if d)
+
+        if winreg is None:
+            possible_results.extend(search_prefixes(self._game_folder_names(hints)))
+            possible_results.extend(self._native_game_dirs())
 
-        result = list(set(possible_results))
+        result = list({self._game_folder(d) for d in possible_results} - {None})
 
         if len(result) > 1:
             raise MultipleFoldersFound(result)
@@ -162,9 +252,70 @@ class Game:
 
         return game
 
+    def save_installed_files(self, installed_files: Dict[int, int]):
+        """Save {addon curse_id: installed file id}"""
+        path = Path(f"./appdata/installed_files/{self.slug}.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with path.open("w") as save_f:
+            json.dump(installed_files, save_f)
+
+    def load_installed_files(self) -> Dict[int, int]:
+        """Load {addon curse_id: installed file id}"""
+        path = Path(f"./appdata/installed_files/{self.slug}.json")
+
+        try:
+            with path.open("r") as load_f:
+                return {int(k): v for k, v in json.load(load_f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def save_path(self, path: Path):
+        """Save the game folder chosen by the user, discover uses it from now on"""
+        save_path = Path(f"./appdata/game_paths/{self.slug}.json")
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with save_path.open("w") as save_f:
+            json.dump(str(path), save_f)
+
+    def load_path(self) -> Optional[Path]:
+        """Load the game folder chosen by the user, None if there is none"""
+        path = Path(f"./appdata/game_paths/{self.slug}.json")
+
+        try:
+            with path.open("r") as load_f:
+                return Path(json.load(load_f))
+        except FileNotFoundError:
+            return None
+
+    def save_installed_file_names(self, file_names: Dict[int, str]):
+        """Save {addon curse_id: installed file name}"""
+        path = Path(f"./appdata/installed_file_names/{self.slug}.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with path.open("w") as save_f:
+            json.dump(file_names, save_f)
+
+    def load_installed_file_names(self) -> Dict[int, str]:
+        """Load {addon curse_id: installed file name}"""
+        path = Path(f"./appdata/installed_file_names/{self.slug}.json")
+
+        try:
+            with path.open("r") as load_f:
+                return {int(k): v for k, v in json.load(load_f).items()}
+        except FileNotFoundError:
+            return {}
+
     def discover(self, info: GameInfo) -> InstalledGame:
-        path = self._discover_game_path(info.game_detection_hints)
-        print(f"Discovered {info.name} in {path.absolute()}")
+        path = self.load_path()
+
+        if path and not path.is_dir():
+            print(f"Saved {info.name} folder {path} does not exist anymore")
+            path = None
+
+        if path is None:
+            path = self._discover_game_path(info.game_detection_hints)
+            print(f"Discovered {info.name} in {path.absolute()}")
 
         addons = self._discover_addons(path, info.category_sections)
 
@@ -175,8 +326,10 @@ class Game:
 
 
 class WoW(Game):
+    manifest_pattern = "*.toc"
+
     def get_addon_local_info(self, addon_path: Path):
-        toc_path = list(addon_path.glob("*.toc"))[0]
+        toc_path = list(addon_path.glob(self.manifest_pattern))[0]
 
         interface = None
         curse_id = None
@@ -222,8 +375,10 @@ class WoW(Game):
 
 
 class TES(Game):
+    manifest_pattern = "*.txt"
+
     def get_addon_local_info(self, addon_path: Path):
-        txt_path = list(addon_path.glob("*.txt"))[0]
+        txt_path = list(addon_path.glob(self.manifest_pattern))[0]
 
         interface = None
         curse_id = None
@@ -255,11 +410,55 @@ class TES(Game):
         )
 
 
+class Minecraft(Game):
+    file_suffixes = {".jar", ".zip"}  # mods, resource packs and shader packs
+    single_file_addons = True
+
+    def is_addon_path(self, path: Path) -> bool:
+        """Minecraft addons are single files"""
+        return path.suffix.lower() in self.file_suffixes and path.is_file()
+
+    def install_archive(
+        self, archive_path: Path, section_path: Path, addon_file: AddonFile
+    ):
+        """Mods and packs are used as they are, so the file is copied. The file of
+        another version of the addon is removed, two versions of a mod don't load.
+        """
+        target = section_path / addon_file.file_name
+        section_path.mkdir(parents=True, exist_ok=True)
+
+        part_path = target.with_name(f".{target.name}.{os.getpid()}.part")
+        shutil.copyfile(archive_path, part_path)
+        os.replace(part_path, target)
+
+        old_name = self.load_installed_file_names().get(addon_file.project_id)
+        if old_name and old_name != target.name and (section_path / old_name).is_file():
+            (section_path / old_name).unlink()
+
+    def get_addon_local_info(self, addon_path: Path):
+        # files have no manifest, the project id is known for files installed here
+        curse_ids = {name: id for id, name in self.load_installed_file_names().items()}
+
+        return AddonLocalInfo(
+            interface=None,
+            folder_name=addon_path.name,
+            title=addon_path.stem,
+            curse_id=curse_ids.get(addon_path.name),
+        )
+
+    def get_config_dir(self, installed_game_path: Path):
+        return installed_game_path / "config"
+
+    def _native_game_dirs(self) -> List[Path]:
+        return find_minecraft_instances()
+
+
 GAMES = {
     "wow_retail": WoW(1, "wow_retail", "_retail_"),
     "wow_classic": WoW(1, "wow_classic", "_classic_era_"),
     "wow_tbc": WoW(1, "wow_burning_crusade", "_classic_"),
     "teso": TES(455, "teso", None),
+    "minecraft": Minecraft(432, "minecraft", None),
 }
 
 """
@@ -268,7 +467,6 @@ Other known games. Will be added later.
 335 - runes of magic
 423 - world of tanks
 424 - rift
-432 - minecraft
 449 - skyrim
 454 - wildstar
 """
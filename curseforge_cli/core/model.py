@@ -1,6 +1,6 @@
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 import re
 
 from pydantic import BaseModel, validator
@@ -37,6 +37,23 @@ class colors:
     BOLD = "\u001b[1m"
     RESET = "\u001b[0m"
 
+    @classmethod
+    def _codes(cls) -> dict:
+        if "_CODES" not in vars(cls):
+            cls._CODES = {k: v for k, v in vars(cls).items() if k.isupper()}
+        return cls._CODES
+
+    @classmethod
+    def disable(cls):
+        """Turn off coloring, e.g. when stdout is not a terminal"""
+        for name in cls._codes():
+            setattr(cls, name, "")
+
+    @classmethod
+    def enable(cls):
+        for name, code in cls._codes().items():
+            setattr(cls, name, code)
+
 
 class GameDetectionHint(BaseModel):
     type: int
@@ -201,6 +218,8 @@ class AddonLocalInfo(BaseModel):
 
     @validator("title", always=True)
     def remove_coloring(cls, v, values) -> str:
+        if v is None:
+            return v
         return re.sub(r"\|c[0-9a-fA-F]{8}|\|r", "", v)
 
 
@@ -272,6 +291,21 @@ class InstalledAddon(BaseModel):
     local_info: AddonLocalInfo
     info: Optional[AddonInfo]
     date_installed: Optional[datetime]
+    file_id: Optional[int]
+
+    @property
+    def is_outdated(self) -> bool:
+        if not self.info:
+            return False
+
+        latest_file = self.info.latest_file
+
+        if self.file_id:
+            return self.file_id != latest_file.id
+        elif self.date_installed:
+            return latest_file.file_date > self.date_installed
+        else:
+            return True
 
     @property
     def view(self):
@@ -309,3 +343,114 @@ class InstalledGame(BaseModel):
             view = f"\nNo addons installed for {self.info.name}"
 
         return view
+
+
+class ManifestGame(BaseModel):
+    addons: List[int] = []
+
+
+class Manifest(BaseModel):
+    """Addons to keep installed per game slug"""
+
+    games: Dict[str, ManifestGame] = {}
+
+
+class Lockfile(BaseModel):
+    """Installed file id per addon id per game slug"""
+
+    games: Dict[str, Dict[int, int]] = {}
+
+
+class SYNC_ACTION:
+    INSTALL = "install"  # Addon is missing
+    UPGRADE = "upgrade"  # Another file of the addon is installed
+    REMOVE = "remove"  # Addon is not in the manifest
+    NOOP = "noop"  # Addon is installed as required
+
+
+class SyncStep(BaseModel):
+    game: str
+    action: str
+    curse_id: int
+    name: str
+    file: Optional[AddonFile]
+    installed_file_id: Optional[int]
+    folders: List[str] = []
+
+    @property
+    def view(self) -> str:
+        action_colors = {
+            SYNC_ACTION.INSTALL: colors.GREEN,
+            SYNC_ACTION.UPGRADE: colors.YELLOW,
+            SYNC_ACTION.REMOVE: colors.RED,
+        }
+        action = f"{action_colors.get(self.action, colors.GRAY)}{self.action:<8}{colors.RESET}"
+        header = f"{action}{colors.BOLD}{self.name}{colors.RESET} #{self.curse_id}"
+
+        if self.action == SYNC_ACTION.REMOVE:
+            return f"{header} [{', '.join(self.folders)}]"
+        elif self.action == SYNC_ACTION.UPGRADE:
+            return f"{header} {self.installed_file_id or 'unknown'} -> {self.file.id} {self.file.display_name}"
+        else:
+            return f"{header} {self.file.id} {self.file.display_name}"
+
+
+class VerifyResult(BaseModel):
+    game: str
+    curse_id: int
+    name: str
+    file_id: int
+    modified: List[str] = []
+    missing: List[str] = []
+    extra: List[str] = []
+
+    @property
+    def is_intact(self) -> bool:
+        return not self.modified and not self.missing and not self.extra
+
+    @property
+    def view(self) -> str:
+        header = f"{colors.BOLD}{self.name}{colors.RESET} #{self.curse_id}: {len(self.modified)} modified, {len(self.missing)} missing, {len(self.extra)} extra"
+
+        rows = [header]
+        rows.extend(f"{colors.YELLOW}M{colors.RESET} {p}" for p in self.modified)
+        rows.extend(f"{colors.RED}D{colors.RESET} {p}" for p in self.missing)
+        rows.extend(f"{colors.GRAY}?{colors.RESET} {p}" for p in self.extra)
+
+        return "\n".join(rows)
+
+
+class PackFile(BaseModel):
+    project_id: int
+    file_id: int
+    required: bool = True
+
+    @classmethod
+    def from_api(cls, data: dict):
+        kwargs = dict(
+            project_id=data.get("projectID"),
+            file_id=data.get("fileID"),
+            required=data.get("required", True),
+        )
+        return cls(**kwargs)
+
+
+class PackManifest(BaseModel):
+    """manifest.json of a modpack archive"""
+
+    name: str
+    version: Optional[str]
+    game_version: Optional[str]
+    files: List[PackFile]
+    overrides: str = "overrides"
+
+    @classmethod
+    def from_api(cls, data: dict):
+        kwargs = dict(
+            name=data.get("name"),
+            version=data.get("version"),
+            game_version=(data.get("minecraft") or {}).get("version"),
+            files=[PackFile.from_api(f) for f in data.get("files")],
+            overrides=data.get("overrides") or "overrides",
+        )
+        return cls(**kwargs)
@@ -0,0 +1,92 @@
+import io
+import json
+import sys
+from typing import Optional, TextIO
+
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+
+class OUTPUT_FORMAT:
+    TABLE = "table"  # Colored human readable views
+    JSON = "json"  # A single json array of records
+    NDJSON = "ndjson"  # One json record per line
+
+    ALL = (TABLE, JSON, NDJSON)
+
+
+class Writer:
+    def __init__(
+        self,
+        output_format: str = OUTPUT_FORMAT.TABLE,
+        stream: Optional[TextIO] = None,
+        buffer_size: int = 64 * 1024,
+    ) -> None:
+        """Streams records to stdout as they are produced.
+
+        Everything is written through a single buffer which is flushed when it grows
+        over buffer_size, on every record when the stream is interactive, and on close.
+
+        Args:
+            output_format (str, optional): One of OUTPUT_FORMAT. Defaults to table.
+            stream (Optional[TextIO], optional): Defaults to sys.stdout.
+            buffer_size (int, optional): Defaults to 64 KiB.
+        """
+        if output_format not in OUTPUT_FORMAT.ALL:
+            raise ValueError(f"Unknown output format {output_format}")
+
+        self.output_format = output_format
+        self.stream = stream or sys.stdout
+        self.buffer_size = buffer_size
+
+        try:
+            self.interactive = self.stream.isatty()
+        except (AttributeError, ValueError):
+            self.interactive = False
+
+        self._buffer = io.StringIO()
+        self._records_written = 0
+
+    def _write(self, text: str):
+        self._buffer.write(text)
+
+        if self.interactive or self._buffer.tell() >= self.buffer_size:
+            self.flush()
+
+    def text(self, text: str):
+        """Write human readable text. Ignored by machine readable formats"""
+        if self.output_format == OUTPUT_FORMAT.TABLE:
+            self._write(f"{text}\n")
+
+    def write(self, record: BaseModel, game: Optional[str] = None):
+        if self.output_format == OUTPUT_FORMAT.TABLE:
+            self._write(f"{record.view}\n")
+            self._records_written += 1
+            return
+
+        row = record.dict()
+        if game:
+            row = {"game": game, **row}
+        row_str = json.dumps(row, default=pydantic_encoder)
+
+        if self.output_format == OUTPUT_FORMAT.NDJSON:
+            self._write(f"{row_str}\n")
+        elif self._records_written == 0:
+            self._write(f"[{row_str}")
+        else:
+            self._write(f",\n{row_str}")
+
+        self._records_written += 1
+
+    def flush(self):
+        self.stream.write(self._buffer.getvalue())
+        self.stream.flush()
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def close(self):
+        if self.output_format == OUTPUT_FORMAT.JSON:
+            self._buffer.write("[]\n" if self._records_written == 0 else "]\n")
+
+        self.flush()
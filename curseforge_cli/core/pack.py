@@ -0,0 +1,124 @@
+from ..core.utils import resolve_addon_path
+import asyncio
+from functools import partial
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..core.api import AsyncAPI
+from ..core.archive import MappedZip
+from ..core.game import Game
+from ..core.model import AddonFile, PackFile, PackManifest
+
+PACK_MANIFEST = "manifest.json"
+DEFAULT_FOLDER = "mods"  # for files whose addon can't be loaded
+
+
+def read_pack_manifest(zip_f: MappedZip) -> Optional[PackManifest]:
+    """None if the archive is not a modpack"""
+    member = zip_f.find(PACK_MANIFEST)
+    if not member:
+        return
+
+    return PackManifest.from_api(json.loads(zip_f.read(member)))
+
+
+async def _install_file(
+    pack_file: PackFile, instance_path: Path, api: AsyncAPI, game: Game
+) -> AddonFile:
+    addon_file = await api.get_addon_file(pack_file.project_id, pack_file.file_id)
+
+    # the addon category tells where its files go, e.g. mods or resourcepacks
+    try:
+        addon = await api.get_addon(pack_file.project_id, game.slug)
+    except Exception:
+        addon = None  # e.g. a removed project, its file can still be downloaded
+    if addon:
+        folder = resolve_addon_path(instance_path, addon.category_section.path)
+    else:
+        folder = instance_path / DEFAULT_FOLDER
+
+    # cached like other addon files, so they can be verified and pruned
+    archive_path = await api.download_archive(addon_file, progress=False)
+    if not archive_path:
+        raise IOError(f"download of {addon_file.file_name} was incomplete")
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, game.install_archive, archive_path, folder, addon_file
+    )
+
+    return addon_file
+
+
+async def install_pack(
+    archive_path: Path,
+    instance_path: Path,
+    api: AsyncAPI,
+    game: Game,
+    max_workers: Optional[int] = None,
+) -> Tuple[PackManifest, Dict[int, AddonFile], List[PackFile]]:
+    """Install a modpack archive into instance_path.
+
+    Overrides are extracted in parallel from the mapped archive while the files listed
+    in the pack manifest are downloaded. Downloads are taken from a queue by
+    max_workers workers, so thousands of files never mean thousands of tasks or open
+    files at once. Files are installed the way game installs its addons.
+
+    Args:
+        archive_path (Path): Modpack zip with a manifest.json
+        instance_path (Path): Game folder to install into
+        api (AsyncAPI): API to download files with
+        game (Game): Game to install the files for
+        max_workers (Optional[int], optional): Concurrent downloads.
+            Defaults to the transport's concurrency.
+
+    Returns the pack manifest, {project id: installed file} and files that failed.
+    """
+    loop = asyncio.get_running_loop()
+
+    with MappedZip(archive_path) as zip_f:
+        manifest = read_pack_manifest(zip_f)
+        if not manifest:
+            raise ValueError(f"{archive_path} has no {PACK_MANIFEST}, not a modpack")
+
+        prefix = f"{manifest.overrides.strip('/')}/"
+        overrides = [m for m in zip_f.members if m.name.startswith(prefix)]
+        extracting = loop.run_in_executor(
+            None, partial(zip_f.extract_all, instance_path, overrides, prefix)
+        )
+
+        queue = asyncio.Queue()
+        for pack_file in manifest.files:
+            if pack_file.required:
+                queue.put_nowait(pack_file)
+
+        from tqdm import tqdm
+
+        progress_bar = tqdm(total=queue.qsize(), unit="file")
+        installed = {}
+        failed = []
+
+        async def _worker():
+            while not queue.empty():
+                pack_file = queue.get_nowait()
+                try:
+                    installed[pack_file.project_id] = await _install_file(
+                        pack_file, instance_path, api, game
+                    )
+                except Exception as e:
+                    print(
+                        f"Failed to install #{pack_file.project_id} file {pack_file.file_id} because {type(e)}: {e}"
+                    )
+                    failed.append(pack_file)
+                progress_bar.update(1)
+
+        workers = max_workers or api.transport.max_concurrency
+        try:
+            await asyncio.gather(*(_worker() for _ in range(workers)))
+        finally:
+            progress_bar.close()
+            # the archive stays mapped until the overrides are extracted
+            await extracting
+
+    return manifest, installed, failed
@@ -0,0 +1,316 @@
+import asyncio
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+import random
+from threading import Condition, Lock
+import time
+from typing import Optional
+
+from requests import Response, Session
+from requests.exceptions import ConnectionError, Timeout
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after(headers) -> float:
+    """Seconds to wait according to the Retry-After header, 0 if there is none"""
+    value = headers.get("Retry-After")
+    if not value:
+        return 0.0
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _AdaptiveLimits:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        initial_window: int,
+        min_window: int,
+        max_window: int,
+        latency_factor: float,
+    ) -> None:
+        """AIMD window, token bucket and Retry-After pause shared by the thread and
+        asyncio limiters. Not thread safe, subclasses take care of locking.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_window = min_window
+        self.max_window = max_window
+        self.latency_factor = latency_factor
+
+        self._window = float(initial_window)
+        self._in_flight = 0
+        self._min_latency = None
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+
+        self._tokens = float(burst)
+        self._tokens_updated = time.monotonic()
+
+    @property
+    def window(self) -> int:
+        return int(self._window)
+
+    def _token_wait(self) -> float:
+        """Take a token and return 0, or return seconds until one is available"""
+        now = time.monotonic()
+        elapsed = now - self._tokens_updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._tokens_updated = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+
+        return (1 - self._tokens) / self.rate
+
+    def _update_window(self, latency: float, congested: bool):
+        """Account a finished request"""
+        self._in_flight -= 1
+        now = time.monotonic()
+
+        if not congested:
+            if self._min_latency is None or latency < self._min_latency:
+                self._min_latency = latency
+            congested = latency > self.latency_factor * self._min_latency
+
+        if not congested:
+            self._window = min(self.max_window, self._window + 1 / self._window)
+        elif now - self._last_decrease > latency:
+            # in flight responses reflect the old window, decrease once per round trip
+            self._window = max(self.min_window, self._window / 2)
+            self._last_decrease = now
+
+    def _extend_pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RequestScheduler(_AdaptiveLimits):
+    RETRY_STATUSES = RETRY_STATUSES
+
+    def __init__(
+        self,
+        session: Session,
+        rate: float = 20.0,
+        burst: int = 40,
+        initial_window: int = 4,
+        min_window: int = 1,
+        max_window: int = 32,
+        latency_factor: float = 3.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        timeout: tuple = (5, 30),
+    ) -> None:
+        """Sends every API request and keeps the load at what the server tolerates.
+
+        Concurrency is limited by an AIMD window: it grows by one request per window of
+        fast responses and halves on errors or when latency grows over
+        latency_factor times the fastest seen response. On top of that requests are
+        rate limited by a token bucket. 429 and 5xx responses and connection errors
+        are retried with jittered exponential backoff, Retry-After pauses all requests.
+        Identical GET requests in flight at the same time are sent once.
+
+        Args:
+            session (Session): Session to send requests with
+            rate (float, optional): Requests per second. Defaults to 20.0.
+            burst (int, optional): Token bucket size. Defaults to 40.
+            initial_window (int, optional): Defaults to 4.
+            min_window (int, optional): Defaults to 1.
+            max_window (int, optional): Defaults to 32.
+            latency_factor (float, optional): Defaults to 3.0.
+            max_retries (int, optional): Defaults to 4.
+            backoff_base (float, optional): Seconds. Defaults to 0.5.
+            backoff_cap (float, optional): Seconds. Defaults to 30.0.
+            timeout (tuple, optional): Connect and read timeouts. Defaults to (5, 30).
+        """
+        super().__init__(
+            rate, burst, initial_window, min_window, max_window, latency_factor
+        )
+        self.session = session
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+
+        self._window_cond = Condition()
+        self._tokens_lock = Lock()
+
+        self._pending_lock = Lock()
+        self._pending = {}
+
+    def _take_token(self):
+        while True:
+            with self._tokens_lock:
+                wait = self._token_wait()
+            if not wait:
+                return
+
+            time.sleep(wait)
+
+    def _acquire_slot(self):
+        with self._window_cond:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._window_cond.wait(pause)
+                elif self._in_flight >= int(self._window):
+                    self._window_cond.wait()
+                else:
+                    break
+
+            self._in_flight += 1
+
+    def _release_slot(self, latency: float, congested: bool):
+        with self._window_cond:
+            self._update_window(latency, congested)
+            self._window_cond.notify_all()
+
+    def _retry_after(self, response: Optional[Response]) -> float:
+        return retry_after(response.headers) if response is not None else 0.0
+
+    def _pause(self, seconds: float):
+        with self._window_cond:
+            self._extend_pause(seconds)
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        """Send a request, retrying failures.
+
+        Returns the last response if it still fails after max_retries, raises the last
+        connection error if there was no response at all.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self._take_token()
+            self._acquire_slot()
+
+            start = time.monotonic()
+            response = None
+            error = None
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                error = e
+            except BaseException:
+                self._release_slot(time.monotonic() - start, congested=True)
+                raise
+
+            failed = error is not None or response.status_code in self.RETRY_STATUSES
+            self._release_slot(time.monotonic() - start, congested=failed)
+
+            if not failed:
+                return response
+            if attempt == self.max_retries:
+                if error:
+                    raise error
+                return response
+
+            backoff = min(self.backoff_cap, self.backoff_base * 2**attempt)
+            retry_after = self._retry_after(response)
+            if retry_after:
+                self._pause(retry_after)
+            if response is not None:
+                response.close()
+
+            time.sleep(max(retry_after, random.uniform(0, backoff)))
+
+    def get(self, url: str, **kwargs) -> Response:
+        """GET url. Identical requests in flight at the same time share one response.
+        Streamed requests are always sent separately.
+        """
+        if kwargs.get("stream"):
+            return self.request("GET", url, **kwargs)
+
+        with self._pending_lock:
+            future = self._pending.get(url)
+            is_leader = future is None
+            if is_leader:
+                future = self._pending[url] = Future()
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            response = self.request("GET", url, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._pending_lock:
+                del self._pending[url]
+
+
+class AsyncLimiter(_AdaptiveLimits):
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: int = 40,
+        initial_window: int = 4,
+        min_window: int = 1,
+        max_window: int = 32,
+        latency_factor: float = 3.0,
+    ) -> None:
+        """The RequestScheduler limits for asyncio transports: requests wait for a
+        token and a slot in the AIMD window, and Retry-After pauses all of them.
+        Must only be used from one event loop.
+
+        Args:
+            rate (float, optional): Requests per second. Defaults to 20.0.
+            burst (int, optional): Token bucket size. Defaults to 40.
+            initial_window (int, optional): Defaults to 4.
+            min_window (int, optional): Defaults to 1.
+            max_window (int, optional): Defaults to 32.
+            latency_factor (float, optional): Defaults to 3.0.
+        """
+        super().__init__(
+            rate, burst, initial_window, min_window, max_window, latency_factor
+        )
+        self._waiters = []
+
+    async def acquire(self):
+        """Wait for a token and a free slot of the window"""
+        while True:
+            wait = self._token_wait()
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            elif self._in_flight >= int(self._window):
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                await waiter
+            else:
+                break
+
+        self._in_flight += 1
+
+    def release(self, latency: float, congested: bool):
+        """Free the slot of a request that took latency seconds"""
+        self._update_window(latency, congested)
+
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def pause(self, seconds: float):
+        """Hold every request for seconds, e.g. on Retry-After"""
+        self._extend_pause(seconds)
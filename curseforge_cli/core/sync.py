@@ -0,0 +1,159 @@
+from ..core.utils import resolve_addon_path
+import asyncio
+from pathlib import Path
+import shutil
+from typing import Dict, List, Optional
+
+from ..core.api import API, AsyncAPI
+from ..core.game import Game
+from ..core.model import (
+    SYNC_ACTION,
+    AddonFile,
+    InstalledGame,
+    Lockfile,
+    Manifest,
+    SyncStep,
+)
+
+
+def lockfile_path(manifest_path: Path) -> Path:
+    """curseforge.json -> curseforge.lock.json"""
+    return manifest_path.with_name(f"{manifest_path.stem}.lock{manifest_path.suffix}")
+
+
+def load_manifest(path: Path) -> Manifest:
+    return Manifest.parse_file(path, content_type="json")
+
+
+def load_lockfile(path: Path) -> Lockfile:
+    try:
+        return Lockfile.parse_file(path, content_type="json")
+    except FileNotFoundError:
+        return Lockfile()
+
+
+def save_lockfile(lockfile: Lockfile, path: Path):
+    with path.open("w") as lock_f:
+        lock_f.write(lockfile.json(indent=2))
+
+
+def plan_sync(
+    game_slug: str,
+    installed_game: InstalledGame,
+    wanted: List[int],
+    pins: Dict[int, int],
+    api: API,
+    game_flavor: str,
+) -> List[SyncStep]:
+    """Compare installed addons with the wanted ones.
+
+    Pinned addons must have exactly the pinned file installed, other addons are
+    installed or upgraded to their latest file. Addons missing from wanted are removed,
+    unless their folders belong to a wanted file, e.g. bundled libraries.
+    Addons whose pinned file can't be loaded are skipped.
+    """
+    addon_infos = api.get_addons(wanted, game_flavor)
+
+    installed = {}
+    for addon in installed_game.addons:
+        if addon.local_info.curse_id:
+            installed.setdefault(addon.local_info.curse_id, []).append(addon)
+
+    steps = []
+    wanted_folders = set()
+
+    for curse_id in dict.fromkeys(wanted):
+        info = addon_infos.get(curse_id)
+        if not info:
+            print(f"Addon #{curse_id} is not available for {game_slug}. Skipping...")
+            continue
+
+        target = info.latest_file
+        if curse_id in pins and pins[curse_id] != target.id:
+            try:
+                target = api.get_addon_file(curse_id, pins[curse_id])
+            except Exception as e:
+                print(
+                    f"Pinned file {pins[curse_id]} of {info.name} #{curse_id} is not available because {type(e)}: {e}. Skipping..."
+                )
+                continue
+        wanted_folders.update(target.modules)
+
+        local = installed.get(curse_id)
+        installed_file_id = local[0].file_id if local else None
+
+        if not local:
+            action = SYNC_ACTION.INSTALL
+        elif installed_file_id == target.id:
+            action = SYNC_ACTION.NOOP
+        elif (
+            installed_file_id is None
+            and curse_id not in pins
+            and not local[0].is_outdated
+        ):
+            # installed by another tool, but recent enough
+            action = SYNC_ACTION.NOOP
+        else:
+            action = SYNC_ACTION.UPGRADE
+
+        steps.append(
+            SyncStep(
+                game=game_slug,
+                action=action,
+                curse_id=curse_id,
+                name=info.name,
+                file=target,
+                installed_file_id=installed_file_id,
+            )
+        )
+
+    wanted = set(wanted)
+
+    for curse_id, local in installed.items():
+        if curse_id in wanted:
+            continue
+
+        folders = [
+            a.local_info.folder_name
+            for a in local
+            if a.local_info.folder_name not in wanted_folders
+        ]
+        if folders:
+            steps.append(
+                SyncStep(
+                    game=game_slug,
+                    action=SYNC_ACTION.REMOVE,
+                    curse_id=curse_id,
+                    name=local[0].local_info.title or folders[0],
+                    installed_file_id=local[0].file_id,
+                    folders=folders,
+                )
+            )
+
+    return steps
+
+
+def _remove_folders(step: SyncStep, installed_game: InstalledGame, game: Game):
+    for cat in installed_game.info.category_sections:
+        cat_path = resolve_addon_path(installed_game.path, cat.path)
+        for folder in step.folders:
+            if (cat_path / folder).is_dir():
+                shutil.rmtree(cat_path / folder)
+            elif game.single_file_addons and game.is_addon_path(cat_path / folder):
+                (cat_path / folder).unlink()
+
+    print(f"Removed {step.name} [{', '.join(step.folders)}]")
+
+
+async def apply_sync_step(
+    step: SyncStep, installed_game: InstalledGame, api: AsyncAPI, game: Game
+) -> Optional[AddonFile]:
+    """Carry out a step. Returns the installed file, None if nothing was installed"""
+    if step.action in (SYNC_ACTION.INSTALL, SYNC_ACTION.UPGRADE):
+        return await api.download_addon(
+            step.curse_id, installed_game.path, game, addon_file=step.file
+        )
+
+    if step.action == SYNC_ACTION.REMOVE:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _remove_folders, step, installed_game, game)
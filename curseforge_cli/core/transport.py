@@ -0,0 +1,243 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+import random
+import time
+from typing import Any, Optional, Tuple
+
+from requests import Session
+
+from ..core.scheduler import (
+    RETRY_STATUSES,
+    AsyncLimiter,
+    RequestScheduler,
+    retry_after,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class TRANSPORT:
+    REQUESTS = "requests"  # blocking requests, one thread per request in flight
+    HTTP2 = "http2"  # asyncio httpx, requests multiplexed over a few connections
+
+    ALL = [REQUESTS, HTTP2]
+
+
+class Transport:
+    """Sends API requests for AsyncAPI. All methods are coroutines running in the
+    API event loop.
+    """
+
+    max_concurrency = 1  # requests worth having in flight at once
+
+    async def get_json(self, url: str, headers: dict) -> Any:
+        raise NotImplementedError(f"Override get_json method in {type(self)}")
+
+    async def download(
+        self, url: str, path: Path, headers: dict, progress=None
+    ) -> Tuple[int, int]:
+        """Stream url into path.
+
+        Args:
+            progress (optional): tqdm-like bar, reset with the content length and
+                updated with every written chunk.
+
+        Returns the content length (0 if unknown) and the number of written bytes.
+        """
+        raise NotImplementedError(f"Override download method in {type(self)}")
+
+    async def aclose(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    def __init__(self, scheduler: Optional[RequestScheduler] = None) -> None:
+        """Runs blocking requests through the scheduler in a thread pool sized to
+        the scheduler's largest window.
+        """
+        self.session = Session()
+        self.scheduler = scheduler or RequestScheduler(self.session)
+        self.max_concurrency = self.scheduler.max_window
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def _get_json(self, url: str, headers: dict) -> Any:
+        r = self.scheduler.get(url, headers=headers)
+        r.raise_for_status()
+        return r.json()
+
+    def _download(self, url: str, path: Path, headers: dict, progress):
+        r = self.scheduler.get(url, headers=headers, stream=True)
+        r.raise_for_status()
+
+        total = int(r.headers.get("content-length", 0))
+        if progress is not None:
+            progress.reset(total=total or None)
+
+        written = 0
+        with path.open("wb") as f:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress.update(len(chunk))
+
+        return total, written
+
+    async def get_json(self, url: str, headers: dict) -> Any:
+        return await self._run(self._get_json, url, headers)
+
+    async def download(
+        self, url: str, path: Path, headers: dict, progress=None
+    ) -> Tuple[int, int]:
+        return await self._run(self._download, url, path, headers, progress)
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class Http2Transport(Transport):
+    def __init__(
+        self,
+        limiter: Optional[AsyncLimiter] = None,
+        max_connections: int = 4,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        timeout: tuple = (5, 30),
+    ) -> None:
+        """asyncio HTTP/2 client. Needs httpx with HTTP/2 support:
+        pip install curseforge-cli[http2]
+
+        Requests are multiplexed as streams over at most max_connections connections,
+        servers without HTTP/2 get HTTP/1.1 with keep-alive instead. Every request
+        passes the limiter, which applies the RequestScheduler window, rate limit and
+        Retry-After pauses, and retries follow the RequestScheduler policy.
+
+        Args:
+            limiter (Optional[AsyncLimiter], optional): Defaults to a new AsyncLimiter.
+            max_connections (int, optional): Defaults to 4.
+            max_retries (int, optional): Defaults to 4.
+            backoff_base (float, optional): Seconds. Defaults to 0.5.
+            backoff_cap (float, optional): Seconds. Defaults to 30.0.
+            timeout (tuple, optional): Connect and read timeouts. Defaults to (5, 30).
+        """
+        import httpx
+
+        self._httpx = httpx
+        # raises ImportError if the h2 package is missing
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            follow_redirects=True,
+        )
+        self.limiter = limiter or AsyncLimiter()
+        self.max_concurrency = self.limiter.max_window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    async def _get(self, url: str, headers: dict, stream: bool = False):
+        """GET url through the limiter, retrying connection errors and retryable
+        statuses. Streamed responses hold their slot until the headers arrive only
+        and must be closed by the caller.
+
+        Returns the last response if it still fails after max_retries, raises the last
+        connection error if there was no response at all.
+        """
+        request = self.client.build_request("GET", url, headers=headers)
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+
+            start = time.monotonic()
+            response = None
+            error = None
+
+            try:
+                response = await self.client.send(request, stream=stream)
+            except self._httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self.limiter.release(time.monotonic() - start, congested=True)
+                raise
+
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            self.limiter.release(time.monotonic() - start, congested=failed)
+
+            if not failed:
+                return response
+            if attempt == self.max_retries:
+                if error:
+                    raise error
+                return response
+
+            backoff = min(self.backoff_cap, self.backoff_base * 2**attempt)
+            wait = retry_after(response.headers) if response is not None else 0.0
+            if wait:
+                # Retry-After applies to the whole host, pause every request
+                self.limiter.pause(wait)
+            if response is not None:
+                await response.aclose()
+
+            await asyncio.sleep(max(wait, random.uniform(0, backoff)))
+
+    async def get_json(self, url: str, headers: dict) -> Any:
+        r = await self._get(url, headers)
+        r.raise_for_status()
+        return r.json()
+
+    async def download(
+        self, url: str, path: Path, headers: dict, progress=None
+    ) -> Tuple[int, int]:
+        r = await self._get(url, headers, stream=True)
+
+        try:
+            r.raise_for_status()
+
+            total = int(r.headers.get("content-length", 0))
+            if progress is not None:
+                progress.reset(total=total or None)
+
+            written = 0
+            # chunks are small, writing them into the page cache does not stall the loop
+            with path.open("wb") as f:
+                async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+                    if progress is not None:
+                        progress.update(len(chunk))
+        finally:
+            await r.aclose()
+
+        return total, written
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def make_transport(name: Optional[str] = None) -> Transport:
+    """Create a transport by name. By default HTTP/2 if httpx is installed with HTTP/2
+    support, requests otherwise.
+    """
+    if name == TRANSPORT.REQUESTS:
+        return RequestsTransport()
+    elif name == TRANSPORT.HTTP2:
+        return Http2Transport()
+    elif name is not None:
+        raise ValueError(f"Unknown transport {name}. Choose from {TRANSPORT.ALL}")
+
+    try:
+        return Http2Transport()
+    except ImportError:
+        return RequestsTransport()
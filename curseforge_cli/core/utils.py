@@ -6,6 +6,10 @@ def resolve_addon_path(installed_game_path: Path, category_section_path: Path) -
         "%MYDOCUMENTS%": Path("~").expanduser() / "Documents",
     }
 
+    if not category_section_path.parts:
+        # e.g. minecraft modpacks, which go into the game folder itself
+        return installed_game_path
+
     path_root = category_section_path.parts[0]
 
     if path_root.startswith("%"):
@@ -0,0 +1,203 @@
+from ..core.utils import resolve_addon_path
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import shutil
+from typing import Dict, List, Optional, Tuple
+from zipfile import ZipFile
+import zlib
+
+from ..core.api import API, archive_path, is_valid_archive
+from ..core.game import Game
+from ..core.model import AddonInfo, InstalledGame, VerifyResult
+
+
+class HashCache:
+    def __init__(self, path: Path) -> None:
+        """CRC32 of local files, valid while their size and mtime don't change"""
+        self.path = path
+
+        try:
+            with path.open("r") as cache_f:
+                self._hashes = json.load(cache_f)
+        except (FileNotFoundError, ValueError):
+            self._hashes = {}
+
+    def crc32(self, file_path: Path) -> Optional[int]:
+        """Returns None if the file does not exist"""
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return
+
+        key = str(file_path)
+        cached = self._hashes.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        crc = 0
+        with file_path.open("rb") as f:
+            # zlib releases the GIL on big chunks, so threads hash in parallel
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                crc = zlib.crc32(chunk, crc)
+
+        self._hashes[key] = [stat.st_size, stat.st_mtime_ns, crc]
+
+        return crc
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.path.open("w") as cache_f:
+            json.dump(self._hashes, cache_f)
+
+
+def _archive_members(archive_path: Path) -> Dict[str, int]:
+    """{member name: crc32} of all files in the archive"""
+    with ZipFile(archive_path, "r") as zip_f:
+        return {i.filename: i.CRC for i in zip_f.infolist() if not i.is_dir()}
+
+
+def _local_files(extract_path: Path, folders: List[str]) -> List[str]:
+    """Archive-like names of all files inside folders"""
+    names = []
+
+    for folder in folders:
+        for root, _, files in os.walk(extract_path / folder):
+            rel_root = Path(root).relative_to(extract_path).as_posix()
+            names.extend(f"{rel_root}/{f}" for f in files)
+
+    return names
+
+
+def verify_game(
+    game_slug: str,
+    installed_game: InstalledGame,
+    installed_files: Dict[int, int],
+    api: API,
+    game: Game,
+    hash_cache: HashCache,
+) -> Tuple[List[Tuple[VerifyResult, Path, Path]], int, int]:
+    """Compare addons with archives of their installed files. Single file addons are
+    compared with the whole archive file.
+
+    Only addons with a known installed file can be verified, so they are taken from
+    installed_files rather than from folders, which may be broken or gone.
+    Archives are only taken from the archive cache, nothing is downloaded. Addons
+    without a valid cached archive are unverifiable.
+
+    Returns [(result, archive path, extract path)] of every verified addon, the
+    number of skipped addons with unknown installed files and the number of
+    unverifiable addons.
+    """
+    skipped = {
+        a.local_info.curse_id
+        for a in installed_game.addons
+        if a.local_info.curse_id and a.local_info.curse_id not in installed_files
+    }
+    unverifiable = set()
+
+    cached = {}
+    for curse_id, file_id in installed_files.items():
+        path = archive_path(file_id)
+        if path.exists() and is_valid_archive(path):
+            cached[curse_id] = path
+        else:
+            unverifiable.add(curse_id)
+
+    async def _get_addon(curse_id: int) -> Optional[AddonInfo]:
+        try:
+            return await api.core.get_addon(curse_id, game.slug)
+        except Exception as e:
+            print(f"Failed to get #{curse_id} because {type(e)}: {e}")
+
+    async def _get_addons():
+        return await asyncio.gather(*(_get_addon(i) for i in cached))
+
+    archives = {
+        curse_id: (addon, cached[curse_id])
+        for curse_id, addon in zip(cached, api.run(_get_addons()))
+    }
+
+    checks = []  # (curse_id, member name, expected crc, local path)
+    extra = {}  # curse_id: [member name]
+    extract_paths = {}
+    file_names = game.load_installed_file_names()
+
+    for curse_id, (addon, cached_path) in archives.items():
+        file_name = file_names.get(curse_id)
+        if not addon or (game.single_file_addons and not file_name):
+            unverifiable.add(curse_id)
+            continue
+
+        extract_path = resolve_addon_path(
+            installed_game.path, addon.category_section.path
+        )
+        extract_paths[curse_id] = extract_path
+
+        if game.single_file_addons:
+            expected = hash_cache.crc32(cached_path)
+            checks.append((curse_id, file_name, expected, extract_path / file_name))
+            extra[curse_id] = []
+            continue
+
+        members = _archive_members(cached_path)
+
+        for name, crc in members.items():
+            checks.append((curse_id, name, crc, extract_path / name))
+
+        folders = sorted({name.split("/", 1)[0] for name in members if "/" in name})
+        extra[curse_id] = sorted(
+            set(_local_files(extract_path, folders)) - set(members)
+        )
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+        crcs = executor.map(lambda c: hash_cache.crc32(c[3]), checks)
+
+        results = {
+            curse_id: VerifyResult(
+                game=game_slug,
+                curse_id=curse_id,
+                name=archives[curse_id][0].name,
+                file_id=installed_files[curse_id],
+                extra=extra[curse_id],
+            )
+            for curse_id in extract_paths
+        }
+
+        for (curse_id, name, expected, _), crc in zip(checks, crcs):
+            if crc is None:
+                results[curse_id].missing.append(name)
+            elif crc != expected:
+                results[curse_id].modified.append(name)
+
+    verified = [
+        (result, archives[curse_id][1], extract_paths[curse_id])
+        for curse_id, result in results.items()
+    ]
+
+    return verified, len(skipped), len(unverifiable)
+
+
+def repair(
+    result: VerifyResult,
+    archive_path: Path,
+    extract_path: Path,
+    single_file: bool = False,
+):
+    """Extract modified and missing files again. Extra files are left alone.
+    Single file addons are copied from the archive file.
+    """
+    if single_file:
+        for name in result.modified + result.missing:
+            shutil.copyfile(archive_path, extract_path / name)
+    else:
+        with ZipFile(archive_path, "r") as zip_f:
+            for name in result.modified + result.missing:
+                zip_f.extract(name, extract_path)
+
+    print(
+        f"Repaired {len(result.modified) + len(result.missing)} files of {result.name}"
+    )
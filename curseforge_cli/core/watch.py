@@ -0,0 +1,335 @@
+import ctypes
+import ctypes.util
+from fnmatch import fnmatch
+import os
+from pathlib import Path
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..core.game import Game
+from ..core.model import InstalledAddon, InstalledGame
+from ..core.utils import resolve_addon_path
+
+
+class INOTIFY:
+    CLOSE_WRITE = 0x00000008
+    MOVED_FROM = 0x00000040
+    MOVED_TO = 0x00000080
+    CREATE = 0x00000100
+    DELETE = 0x00000200
+    Q_OVERFLOW = 0x00004000
+    IGNORED = 0x00008000
+    ONLYDIR = 0x01000000
+    ISDIR = 0x40000000
+
+    # CLOSE_WRITE catches addons which are single files rewritten in place
+    MASK = CLOSE_WRITE | CREATE | DELETE | MOVED_FROM | MOVED_TO | ONLYDIR
+
+
+# what a watched folder is to the watcher
+_SECTION = "section"  # category section folder holding addons
+_ADDON = "addon"  # addon folder
+_PARENT = "parent"  # nearest existing parent of a section folder that doesn't exist yet
+
+
+class _Inotify:
+    """Minimal inotify binding on top of libc"""
+
+    _event = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return wd
+
+    def read(self, timeout: float) -> list:
+        """Return [(wd, mask, name)] of events received within timeout seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _cookie, length = self._event.unpack_from(data, offset)
+            offset += self._event.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class AddonWatcher:
+    def __init__(
+        self,
+        game: Game,
+        installed_game: InstalledGame,
+        resolve: Optional[
+            Callable[[List[InstalledAddon]], List[InstalledAddon]]
+        ] = None,
+        on_change: Optional[Callable[[InstalledGame], None]] = None,
+        poll_interval: float = 2.0,
+        debounce: float = 0.5,
+    ) -> None:
+        """Keeps installed_game.addons in sync with addon folders.
+
+        Uses inotify on Linux and polls folder and manifest mtimes elsewhere.
+        Only folders that were touched are loaded and resolved again.
+
+        Args:
+            game (Game): Game used to parse addon manifests
+            installed_game (InstalledGame): Game state to update in place
+            resolve (Optional[Callable], optional): Fills in api info of reloaded addons.
+                Defaults to None.
+            on_change (Optional[Callable], optional): Called with installed_game after
+                every update, e.g. to save it. Defaults to None.
+            poll_interval (float, optional): Seconds between polls. Defaults to 2.0.
+            debounce (float, optional): Seconds to wait for more inotify events, so
+                an extracted archive is handled at once. Defaults to 0.5.
+        """
+        self.game = game
+        self.installed_game = installed_game
+        self.resolve = resolve
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self.section_paths = [
+            resolve_addon_path(installed_game.path, cat.path)
+            for cat in installed_game.info.category_sections
+        ]
+
+        self._index = self._build_index()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _section_addons(self, section_path: Path) -> List[Path]:
+        try:
+            with os.scandir(section_path) as entries:
+                return [
+                    Path(e.path)
+                    for e in entries
+                    if self.game.is_addon_path(Path(e.path))
+                ]
+        except FileNotFoundError:
+            return []
+
+    def _addon_folders(self) -> List[Path]:
+        folders = []
+
+        for section_path in self.section_paths:
+            folders.extend(self._section_addons(section_path))
+
+        return folders
+
+    def _build_index(self) -> Dict[Path, InstalledAddon]:
+        by_folder_name = {
+            a.local_info.folder_name: a for a in self.installed_game.addons
+        }
+
+        return {
+            path: by_folder_name[path.name]
+            for path in self._addon_folders()
+            if path.name in by_folder_name
+        }
+
+    def refresh(self, addon_paths: Iterable[Path]) -> List[InstalledAddon]:
+        """Load and resolve addon folders again. Returns the reloaded addons"""
+        removed = []
+        loaded = []
+
+        for addon_path in set(addon_paths):
+            old = self._index.pop(addon_path, None)
+            if old:
+                removed.append(old)
+
+            if not self.game.is_addon_path(addon_path):
+                continue
+
+            try:
+                addon = self.game.load_addon(addon_path)
+            except Exception:
+                # not an addon or still being written, the next event will retry
+                continue
+
+            self._index[addon_path] = addon
+            loaded.append(addon)
+
+        if not removed and not loaded:
+            return []
+
+        if loaded and self.resolve:
+            self.resolve(loaded)
+
+        # replace the list instead of mutating it, so readers never see a partial update
+        removed_ids = {id(a) for a in removed}
+        self.installed_game.addons = [
+            a for a in self.installed_game.addons if id(a) not in removed_ids
+        ] + loaded
+
+        if self.on_change:
+            self.on_change(self.installed_game)
+
+        return loaded
+
+    def _safe_refresh(self, addon_paths: Iterable[Path]):
+        try:
+            self.refresh(addon_paths)
+        except Exception as e:
+            print(f"Failed to refresh {self.game.slug} addons because {type(e)}: {e}")
+
+    def _run_inotify(self, inotify: _Inotify):
+        watches = {}  # wd: (path, kind)
+        missing = set(self.section_paths)  # sections watched once they exist
+
+        def watch(path: Path, kind: str) -> bool:
+            try:
+                wd = inotify.add_watch(path, INOTIFY.MASK)
+            except OSError:
+                return False
+
+            # the same folder may be a section and the parent of a missing one
+            if wd not in watches or kind == _SECTION:
+                watches[wd] = (path, kind)
+            return True
+
+        def watch_sections() -> List[Path]:
+            """Watch sections which exist now and the nearest existing parent of the
+            others. Returns the addons of sections which were not watched before.
+            """
+            appeared = []
+
+            for section_path in sorted(missing):
+                if section_path.is_dir() and watch(section_path, _SECTION):
+                    missing.discard(section_path)
+                    for addon_path in self._section_addons(section_path):
+                        watch(addon_path, _ADDON)
+                        appeared.append(addon_path)
+                    continue
+
+                parent = next((p for p in section_path.parents if p.is_dir()), None)
+                if parent:
+                    watch(parent, _PARENT)
+
+            return appeared
+
+        watch_sections()
+
+        try:
+            while not self._stop.is_set():
+                events = inotify.read(timeout=self.debounce)
+                touched = set()
+
+                while events:
+                    for wd, mask, name in events:
+                        if mask & INOTIFY.Q_OVERFLOW:
+                            touched.update(self._addon_folders(), self._index)
+                            touched.update(watch_sections())
+                            continue
+
+                        if wd not in watches:
+                            continue
+
+                        path, kind = watches[wd]
+                        created_dir = mask & INOTIFY.ISDIR and mask & (
+                            INOTIFY.CREATE | INOTIFY.MOVED_TO
+                        )
+
+                        if mask & INOTIFY.IGNORED:
+                            del watches[wd]
+                            if kind == _SECTION:
+                                missing.add(path)
+                                watch_sections()
+                        elif kind == _ADDON:
+                            touched.add(path)
+                        elif name:
+                            if kind == _SECTION:
+                                addon_path = path / name
+                                if created_dir:
+                                    watch(addon_path, _ADDON)
+                                touched.add(addon_path)
+                            if created_dir and missing:
+                                touched.update(watch_sections())
+
+                    events = inotify.read(timeout=self.debounce)
+
+                if touched:
+                    self._safe_refresh(touched)
+        finally:
+            inotify.close()
+
+    def _signature(self, addon_path: Path) -> tuple:
+        manifests = []
+
+        try:
+            if addon_path.is_file():
+                stat = addon_path.stat()
+                return stat.st_mtime_ns, stat.st_size
+
+            with os.scandir(addon_path) as entries:
+                for e in entries:
+                    if fnmatch(e.name, self.game.manifest_pattern or "*"):
+                        manifests.append((e.name, e.stat().st_mtime_ns))
+
+            return addon_path.stat().st_mtime_ns, tuple(sorted(manifests))
+        except FileNotFoundError:
+            return None
+
+    def _snapshot(self) -> dict:
+        return {path: self._signature(path) for path in self._addon_folders()}
+
+    def _run_polling(self):
+        snapshot = self._snapshot()
+
+        while not self._stop.wait(self.poll_interval):
+            new_snapshot = self._snapshot()
+            touched = [
+                path
+                for path in snapshot.keys() | new_snapshot.keys()
+                if snapshot.get(path) != new_snapshot.get(path)
+            ]
+            snapshot = new_snapshot
+
+            if touched:
+                self._safe_refresh(touched)
+
+    def start(self):
+        try:
+            inotify = _Inotify()
+            target, args = self._run_inotify, (inotify,)
+        except (OSError, AttributeError, TypeError):
+            target, args = self._run_polling, ()
+
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,258 @@
+"""Resident daemon serving CLI actions over a local Unix socket.
+
+The daemon keeps the API session, API responses and discovered games in memory,
+so forwarded commands skip imports, game discovery and addon resolution.
+Discovered games are kept up to date by watching their addon folders.
+
+Protocol is JSON-RPC 2.0, one request and one response per connection, each a single
+line of json. Methods are the forwarded actions, params are
+{"argv": [full command line], "isatty": bool}, result is {"stdout": str, "stderr": str}.
+
+Only stdlib is imported on module level to keep forwarding fast.
+"""
+
+from io import StringIO
+import json
+import os
+from pathlib import Path
+import socket
+import socketserver
+import sys
+from threading import Lock
+import time
+from typing import List, Optional
+
+SOCKET_PATH = Path("./appdata/daemon.sock")
+DAEMON_ACTIONS = ("list", "search", "install", "update")
+API_CACHE_TTL = 5 * 60  # seconds
+
+
+class DaemonError(Exception):
+    """Raise when the daemon can't be started"""
+
+
+class _ClientStream(StringIO):
+    """Captures output for a client, pretending to be the client's terminal"""
+
+    def __init__(self, isatty: bool) -> None:
+        super().__init__()
+        self._isatty = isatty
+
+    def isatty(self) -> bool:
+        return self._isatty
+
+
+def _supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def _recv_line(sock: socket.socket) -> bytes:
+    chunks = []
+
+    while True:
+        chunk = sock.recv(64 * 1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+
+    return b"".join(chunks)
+
+
+def call(method: str, params: dict, path: Path = SOCKET_PATH) -> dict:
+    """Call the daemon. Raises OSError if it is not running"""
+    if not _supported():
+        raise ConnectionRefusedError("Unix sockets are not supported")
+
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        response = json.loads(_recv_line(sock))
+
+    return response
+
+
+def forward(argv: List[str], path: Path = SOCKET_PATH) -> bool:
+    """Forward command to a running daemon.
+
+    Returns False if the command should run in process instead.
+    """
+    if len(argv) < 2 or argv[1] not in DAEMON_ACTIONS or not path.exists():
+        return False
+
+    try:
+        response = call(
+            argv[1], {"argv": argv, "isatty": sys.stdout.isatty()}, path=path
+        )
+    except (OSError, ValueError):
+        return False
+
+    if "error" in response:
+        print(f"[ERROR] Daemon failed: {response['error']['message']}", file=sys.stderr)
+        return True
+
+    sys.stderr.write(response["result"]["stderr"])
+    sys.stdout.write(response["result"]["stdout"])
+
+    return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request_id = None
+
+        try:
+            request = json.loads(self.rfile.readline())
+            request_id = request.get("id")
+            result = self.server.daemon.dispatch(
+                request["method"], request.get("params", {})
+            )
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except Exception as e:
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32000, "message": f"{type(e).__name__}: {e}"},
+            }
+
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class Daemon:
+    def __init__(self, path: Path = SOCKET_PATH) -> None:
+        from .core.api import API
+
+        self.path = path
+        self.api = API(cache_ttl=API_CACHE_TTL)
+
+        self._clis = {}
+        self._clis_lock = Lock()
+        self._resolved_at = {}  # game slug: monotonic time of the last addon resolution
+        self._watchers = {}
+        # commands redirect the global stdout and toggle colors, so they run one at a time
+        self._run_lock = Lock()
+
+    def get_cli(self, game_slug: str):
+        from .cli import CurseCli
+
+        with self._clis_lock:
+            if game_slug not in self._clis:
+                self._clis[game_slug] = CurseCli(game_slug, api=self.api)
+
+            return self._clis[game_slug]
+
+    def warm_up(self):
+        from .cli import MultiCurseCli
+        from .core.game import GAMES
+
+        clis = [self.get_cli(slug) for slug in GAMES]
+        MultiCurseCli(clis)._load_all()
+
+        self._watch_installed_games()
+
+    def _watch_installed_games(self):
+        now = time.monotonic()
+
+        for game_slug, cli in self._clis.items():
+            if cli._installed_game and game_slug not in self._watchers:
+                self._watchers[game_slug] = cli.watch()
+                self._resolved_at.setdefault(game_slug, now)
+
+    def _refresh_addons(self, game_slugs: List[str], max_age: float):
+        """Resolve addons of loaded games again if their info is older than max_age.
+
+        Installed games are kept for the daemon lifetime and only changed folders are
+        resolved by the watchers, so latest files would never change otherwise.
+        """
+        now = time.monotonic()
+
+        for game_slug in game_slugs:
+            cli = self._clis.get(game_slug)
+            if not cli or not cli._installed_game:
+                continue
+            if now - self._resolved_at.get(game_slug, now) < max_age:
+                continue
+
+            try:
+                cli._resolve_installed_addons(cli._installed_game.addons, max_age)
+                self._resolved_at[game_slug] = now
+            except Exception as e:
+                print(f"Failed to refresh {game_slug} addons because {type(e)}: {e}")
+
+    def dispatch(self, method: str, params: dict) -> dict:
+        from contextlib import redirect_stderr, redirect_stdout
+
+        from .cli import parse_game_slugs, run_cli
+        from .core.model import colors
+
+        argv = params["argv"]
+
+        if method not in DAEMON_ACTIONS or argv[1:2] != [method]:
+            raise ValueError(f"Method '{method}' is not supported")
+
+        stdout = _ClientStream(params.get("isatty", False))
+        stderr = StringIO()
+
+        with self._run_lock:
+            colors.enable()
+
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                if method in ("list", "update"):
+                    # update always fetches addons again, list uses them within the cache ttl
+                    max_age = 0 if method == "update" else API_CACHE_TTL
+                    with redirect_stdout(stderr):
+                        self._refresh_addons(parse_game_slugs(argv[0]), max_age)
+
+                run_cli(argv, get_cli=self.get_cli)
+
+            self._watch_installed_games()
+
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+    def serve(self):
+        if not _supported():
+            raise DaemonError("Unix sockets are not supported on this platform")
+
+        if self.path.exists():
+            try:
+                call("ping", {}, path=self.path)
+                raise DaemonError(f"Daemon is already running on {self.path}")
+            except OSError:
+                self.path.unlink()  # stale socket of a dead daemon
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with socketserver.ThreadingUnixStreamServer(str(self.path), _Handler) as server:
+            server.daemon = self
+            os.chmod(self.path, 0o600)
+
+            try:
+                self.warm_up()
+                print(f"Listening on {self.path.absolute()}")
+
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                self.path.unlink()
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv[:1] == ["daemon"]:
+        try:
+            Daemon().serve()
+        except DaemonError as de:
+            print(f"[ERROR] {de}. Exiting...")
+        return
+
+    if forward(argv):
+        return
+
+    from .cli import run_cli
+
+    run_cli(argv)
@@ -16,8 +16,12 @@ long_description = (here / 'README.md').read_text(encoding='utf-8')
 
 install_requires = ['pydantic>=1.8.2,<2.0.0', 'requests>=2.26.0,<3.0.0', 'setuptools==58.0.4']
 
+extras_require = {
+    'http2': ['httpx[http2]>=0.20.0,<1.0.0'],
+}
+
 entry_points = {
-    'console_scripts': ['curseforge-cli=curseforge_cli.cli:run_cli'],
+    'console_scripts': ['curseforge-cli=curseforge_cli.daemon:main'],
 }
 
 setup_kwargs = {
@@ -31,8 +35,9 @@ setup_kwargs = {
     'maintainer': None,
     'maintainer_email': None,
     'url': 'https://github.com/mtalimanchuk/curseforge-cli',
-    'packages': find_packages(),
+    'packages': find_packages(exclude=['benchmarks', 'tests']),
     'install_requires': install_requires,
+    'extras_require': extras_require,
     'python_requires': '>=3.7,<4',
     'entry_points': entry_points,
 }
@@ -0,0 +1,222 @@
+from pathlib import Path
+import struct
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile
+import zlib
+
+import pytest
+
+from curseforge_cli.core.archive import MappedZip
+
+CONTENT = {
+    "Addon/Addon.toc": b"## Interface: 90005\n## Title: Addon\n",
+    "Addon/Core/Main.lua": b"local function f() return 42 end\n" * 5000,
+    "Addon/Media/empty.tga": b"",
+    "Addon/Media/random.bin": bytes(range(256)) * 64,
+}
+
+
+def _make_zip(path: Path, compression: int, content: dict = CONTENT) -> Path:
+    with ZipFile(path, "w", compression) as zip_f:
+        zip_f.writestr("Addon/", b"")
+        for name, data in content.items():
+            zip_f.writestr(name, data)
+
+    return path
+
+
+def _tree(path: Path) -> dict:
+    return {
+        p.relative_to(path).as_posix(): p.read_bytes()
+        for p in path.rglob("*")
+        if p.is_file()
+    }
+
+
+def _assert_same_as_zipfile(path: Path, tmp_path: Path):
+    with ZipFile(path) as zip_f, MappedZip(path) as mapped:
+        infos = zip_f.infolist()
+
+        assert [m.name for m in mapped.members] == [i.filename for i in infos]
+        for member, info in zip(mapped.members, infos):
+            assert member.file_size == info.file_size
+            assert member.compressed_size == info.compress_size
+            assert member.crc == info.CRC
+            assert member.is_dir == info.is_dir()
+            if not member.is_dir:
+                assert mapped.read(member) == zip_f.read(info)
+
+        mapped.extract_all(tmp_path / "mapped")
+        zip_f.extractall(tmp_path / "zipfile")
+
+    assert _tree(tmp_path / "mapped") == _tree(tmp_path / "zipfile")
+
+
+@pytest.mark.parametrize("compression", [ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2])
+def test_matches_zipfile(tmp_path, compression):
+    path = _make_zip(tmp_path / "addon.zip", compression)
+
+    _assert_same_as_zipfile(path, tmp_path)
+
+
+def test_extract_strip(tmp_path):
+    path = _make_zip(tmp_path / "addon.zip", ZIP_DEFLATED)
+
+    with MappedZip(path) as mapped:
+        members = [m for m in mapped.members if m.name.startswith("Addon/Core/")]
+        mapped.extract_all(tmp_path / "out", members, "Addon/")
+
+    assert _tree(tmp_path / "out") == {"Core/Main.lua": CONTENT["Addon/Core/Main.lua"]}
+
+
+def test_zip64_end_of_central_directory(tmp_path):
+    # more than 0xFFFF members need the zip64 end of central directory
+    path = tmp_path / "many.zip"
+    with ZipFile(path, "w", ZIP_STORED) as zip_f:
+        for i in range(0x10000 + 1):
+            zip_f.writestr(f"f{i}", b"")
+
+    with ZipFile(path) as zip_f, MappedZip(path) as mapped:
+        assert len(mapped.members) == 0x10000 + 1
+        assert [m.name for m in mapped.members] == zip_f.namelist()
+
+
+def _zip64_member_archive(name: bytes, data: bytes) -> bytes:
+    """Archive whose central directory keeps the sizes and the offset in the zip64
+    extra field, as written for members over 4 GiB
+    """
+    crc = zlib.crc32(data)
+    local = (
+        struct.pack(
+            "<4s5H3L2H",
+            b"PK\x03\x04",
+            45,
+            0,
+            0,
+            0,
+            0,
+            crc,
+            len(data),
+            len(data),
+            len(name),
+            0,
+        )
+        + name
+        + data
+    )
+
+    extra = struct.pack("<2H3Q", 0x0001, 24, len(data), len(data), 0)
+    central = (
+        struct.pack(
+            "<4s6H3L5H2L",
+            b"PK\x01\x02",
+            45,
+            45,
+            0,
+            0,
+            0,
+            0,
+            crc,
+            0xFFFFFFFF,
+            0xFFFFFFFF,
+            len(name),
+            len(extra),
+            0,
+            0,
+            0,
+            0,
+            0xFFFFFFFF,
+        )
+        + name
+        + extra
+    )
+
+    eocd = struct.pack(
+        "<4s4H2LH", b"PK\x05\x06", 0, 0, 1, 1, len(central), len(local), 0
+    )
+
+    return local + central + eocd
+
+
+def test_zip64_extra_field(tmp_path):
+    path = tmp_path / "zip64.zip"
+    path.write_bytes(_zip64_member_archive(b"Addon/big.bin", b"x" * 1000))
+
+    _assert_same_as_zipfile(path, tmp_path)
+
+
+def test_empty_archive(tmp_path):
+    path = tmp_path / "empty.zip"
+    ZipFile(path, "w").close()
+
+    with MappedZip(path) as mapped:
+        assert mapped.members == []
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.zip"
+    path.write_bytes(b"")
+
+    with pytest.raises(BadZipFile):
+        MappedZip(path)
+
+
+@pytest.mark.parametrize("keep", [0.5, 0.99])
+def test_truncated(tmp_path, keep):
+    path = _make_zip(tmp_path / "addon.zip", ZIP_DEFLATED)
+    data = path.read_bytes()
+    path.write_bytes(data[: int(len(data) * keep)])
+
+    with pytest.raises(BadZipFile):
+        ZipFile(path)
+    with pytest.raises(BadZipFile):
+        MappedZip(path)
+
+
+def test_unsafe_names(tmp_path):
+    path = _make_zip(
+        tmp_path / "evil.zip",
+        ZIP_DEFLATED,
+        {
+            "../escape.lua": b"a",
+            "/absolute.lua": b"b",
+            "Addon/../../up.lua": b"c",
+            "..\\Windows\\drive.lua": b"d",
+        },
+    )
+
+    with MappedZip(path) as mapped:
+        mapped.extract_all(tmp_path / "out" / "dest")
+    with ZipFile(path) as zip_f:
+        zip_f.extractall(tmp_path / "zipfile")
+
+    # nothing is written outside of dest, names are cleaned up the way zipfile does
+    assert {p.name for p in (tmp_path / "out").iterdir()} == {"dest"}
+    # zipfile only splits on backslashes on windows, MappedZip does it everywhere
+    mapped_tree = _tree(tmp_path / "out" / "dest")
+    assert mapped_tree.pop("Windows/drive.lua") == b"d"
+    assert mapped_tree == {
+        name: data
+        for name, data in _tree(tmp_path / "zipfile").items()
+        if "drive.lua" not in name
+    }
+    assert "Addon/up.lua" in mapped_tree
+
+
+def test_crc_mismatch(tmp_path):
+    path = _make_zip(tmp_path / "addon.zip", ZIP_DEFLATED)
+    data = bytearray(path.read_bytes())
+
+    # flip the crc of the first file in the central directory
+    pos = data.find(b"PK\x01\x02", data.find(b"PK\x01\x02") + 1)
+    data[pos + 16] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with ZipFile(path) as zip_f, pytest.raises(BadZipFile):
+        zip_f.read("Addon/Addon.toc")
+
+    with MappedZip(path) as mapped:
+        member = mapped.find("Addon/Addon.toc")
+        with pytest.raises(BadZipFile):
+            mapped.read(member)
+        with pytest.raises(BadZipFile):
+            mapped.extract(member, tmp_path / "out")